@@ -1,112 +1,101 @@
 # -*- coding: utf-8 -*-
-import dash
-import dash_html_components as html
-import dash_core_components as dcc
+import json
+import os
 
-import pandas as pd
+import dash
+from dash import html, dcc
+import flask
 
 import usdr
 
-accts = usdr.loadUSDR()
+# the table is queried a page at a time through /api/accounts (see app/usdr_dashboard.js), so the layout only holds
+# the summary, the filters and the table header
+results = usdr.ResultsTable()
+
+# summary numbers come from the aggregate cube built by the pipeline, not from the account rows
+cube = usdr.loadCube()
 
-def generate_table(dataframe, max_rows=25):
-    if type(dataframe) == pd.core.series.Series:
-        dataframe = dataframe.to_frame()
+def generate_filter(name, label, options):
+    return html.Label([label, html.Select(
+        [html.Option('All', value='')] + [html.Option(text, value=str(value)) for value, text in options],
+        id=name + '-filter', className='resultsFilter', name=name)])
+
+# the same rows as the printed report, with each value formatted as it is there
+def generate_summary(report):
+    platforms = [c for c in report.columns if c not in ('section', 'label', 'unit')]
     return html.Table(
-        # Header
-        [html.Tr([html.Th(col) for col in dataframe.columns])] +
+        [html.Tr([html.Th('')] + [html.Th(col.upper()) for col in platforms])] +
+        [html.Tr([html.Td(label)] + [html.Td(value) for value in row]) for label, row in zip(report['label'].str.strip(), formatted_values(report))],
+        className='summaryTable')
+
+def formatted_values(report):
+    platforms = [c for c in report.columns if c not in ('section', 'label', 'unit')]
+    return [[usdr.report.formatValue(row[p], row['unit']) for p in platforms] for _, row in report.iterrows()]
 
-        # Body
-        [html.Tr([
-            html.Td(dataframe.iloc[i][col]) for col in dataframe.columns
-        ]) for i in range(min(len(dataframe), max_rows))
-    ], className='resultsTable')
+def generate_table(columns):
+    return html.Table([html.Thead(html.Tr([html.Th(col) for col in columns]))], className='resultsTable')
 
-app = dash.Dash()
+# Dash serves its own scripts locally, and leaves out resources added with app.css/app.scripts that only have an
+# external URL, so these go to the constructor
+external_css = ["https://codepen.io/chriddyp/pen/bWLwgP.css",
+                "https://cdn.datatables.net/1.10.15/css/jquery.dataTables.min.css"]
+
+external_js = ["https://code.jquery.com/jquery-3.2.1.min.js",
+        "https://cdn.datatables.net/1.10.15/js/jquery.dataTables.min.js",
+        "/app/usdr_dashboard.js"]
+
+app = dash.Dash(__name__, external_stylesheets=external_css, external_scripts=external_js)
+
+options = results.filterOptions()
 
 app.layout = html.Div([
     html.A([ 'Print PDF' ],
         className="button no-print"),
-           
-#==============================================================================
-#     html.Label('Dropdown'),
-#     dcc.Dropdown(
-#         options=[
-#             {'label': 'New York City', 'value': 'NYC'},
-#             {'label': u'Montréal', 'value': 'MTL'},
-#             {'label': 'San Francisco', 'value': 'SF'}
-#         ],
-#         value='MTL'
-#     ),
-# 
-#     html.Label('Multi-Select Dropdown'),
-#     dcc.Dropdown(
-#         options=[
-#             {'label': 'New York City', 'value': 'NYC'},
-#             {'label': u'Montréal', 'value': 'MTL'},
-#             {'label': 'San Francisco', 'value': 'SF'}
-#         ],
-#         value=['MTL', 'SF'],
-#         multi=True
-#     ),
-# 
-#     html.Label('Radio Items'),
-#     dcc.RadioItems(
-#         options=[
-#             {'label': 'New York City', 'value': 'NYC'},
-#             {'label': u'Montréal', 'value': 'MTL'},
-#             {'label': 'San Francisco', 'value': 'SF'}
-#         ],
-#         value='MTL'
-#     ),
-# 
-#     html.Label('Checkboxes'),
-#     dcc.Checklist(
-#         options=[
-#             {'label': 'New York City', 'value': 'NYC'},
-#             {'label': u'Montréal', 'value': 'MTL'},
-#             {'label': 'San Francisco', 'value': 'SF'}
-#         ],
-#         values=['MTL', 'SF']
-#     ),
-# 
-#     html.Label('Text Input'),
-#     dcc.Input(value='MTL', type='text'),
-# 
-#     html.Label('Slider'),
-#     dcc.Slider(
-#         min=0,
-#         max=9,
-#         marks={i: 'Label {}'.format(i) if i == 1 else str(i) for i in range(1, 6)},
-#         value=5,
-#     ),
-#             
-#==============================================================================
-    generate_table(accts),
-    
-], style={'columnCount': 2})
 
+    generate_summary(usdr.summarizeReport(cube)),
 
-external_css = ["https://codepen.io/chriddyp/pen/bWLwgP.css",
-                "https://cdn.datatables.net/1.10.15/css/jquery.dataTables.min.css"]
+    generate_filter('platform', 'Platform', options['platform']),
+    generate_filter('department', 'Department', options['department']),
+    generate_filter('agency', 'Agency', options['agency']),
+    generate_filter('recency', 'Last posted', options['recency']),
 
-for css in external_css:
-    app.css.append_css({ "external_url": css })
+    generate_table(usdr.TABLE_COLUMNS),
 
-external_js = ["https://code.jquery.com/jquery-3.2.1.min.js",
-        "https://cdn.datatables.net/1.10.15/js/jquery.dataTables.min.js"]
+])
+
+# DataTables server-side processing: one page of rows per request, sorted and filtered here
+@app.server.route('/api/accounts')
+def accounts_page():
+    args = flask.request.args
+    sort_column = args.get('order[0][column]', type=int)
+
+    total, filtered, page = results.query(
+        start=args.get('start', 0, type=int),
+        length=min(args.get('length', 25, type=int), 1000),
+        sort=usdr.TABLE_COLUMNS[sort_column] if sort_column is not None else None,
+        ascending=args.get('order[0][dir]', 'asc') != 'desc',
+        platform=args.get('platform'),
+        agency=args.get('agency'),
+        department=args.get('department'),
+        recency=args.get('recency'),
+        search=args.get('search[value]'))
+
+    return flask.jsonify({
+        'draw': args.get('draw', 0, type=int),
+        'recordsTotal': total,
+        'recordsFiltered': filtered,
+        'data': page.astype(object).where(page.notnull(), '').values.tolist(),
+    })
 
-for js in external_js:
-    app.scripts.append_script({ "external_url": js })
+# summary for the agency picked in the agency filter, from the cube
+@app.server.route('/api/summary')
+def agency_summary():
+    report = usdr.summarizeReport(cube, flask.request.args.get('agency', usdr.ALL_AGENCIES, type=int) or usdr.ALL_AGENCIES)
+    return flask.jsonify({'index': report.index.tolist(), 'report': json.loads(usdr.formatReport(report, 'json')), 'data': formatted_values(report)})
 
+@app.server.route('/app/<path:filename>')
+def app_static(filename):
+    return flask.send_from_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'), filename)
 
-#==============================================================================
-# @app.callback(
-#     dash.dependencies.Output('output-a', 'children'),
-#     [dash.dependencies.Input('dropdown-a', 'value')])
-# def callback_a(dropdown_value):
-#     return 'You\'ve selected "{}"'.format(dropdown_value)
-#==============================================================================
-    
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    app.run_server(debug=True)
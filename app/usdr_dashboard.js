@@ -1,3 +1,41 @@
-$(document).ready(function(){
-    $('.resultsTable').DataTable();
-});
\ No newline at end of file
+// Dash renders the layout after the page loads, so wait for the table before setting it up
+function initResultsTable() {
+    if (!$('.resultsTable').length) {
+        return setTimeout(initResultsTable, 100);
+    }
+
+    // sorting, filtering and paging happen on the server; each request returns one page of rows
+    var table = $('.resultsTable').DataTable({
+        serverSide: true,
+        processing: true,
+        searchDelay: 300,
+        ajax: {
+            url: '/api/accounts',
+            data: function (params) {
+                $('.resultsFilter').each(function () {
+                    params[this.name] = $(this).val();
+                });
+            }
+        }
+    });
+
+    $(document).on('change', '.resultsFilter', function () {
+        table.draw();
+    });
+
+    // the summary follows the agency filter
+    $(document).on('change', '#agency-filter', function () {
+        $.getJSON('/api/summary', {agency: $(this).val()}, updateSummary);
+    });
+}
+
+function updateSummary(summary) {
+    var rows = $('.summaryTable tr').slice(1);
+    summary.data.forEach(function (values, i) {
+        $(rows[i]).children('td').slice(1).each(function (j) {
+            $(this).text(values[j].toLocaleString());
+        });
+    });
+}
+
+$(document).ready(initResultsTable);
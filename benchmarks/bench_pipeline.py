@@ -0,0 +1,160 @@
+# Time and memory-profile each offline step of the pipeline (loading, preparing, merging, aggregating, reporting and
+# the dashboard table) on synthetic registries of several sizes (see synthetic.py), and append the results to a
+# JSON-lines file tagged with the current commit, so runs from different commits can be compared.
+#
+#   $ python benchmarks/bench_pipeline.py [--sizes 10000 100000 1000000] [--no-memory] [--workers N]      (from the repo root)
+#   $ python benchmarks/bench_pipeline.py --compare [commit commit]
+#
+# Each size runs twice: once for timing, and once under tracemalloc for each step's peak memory (tracemalloc slows
+# Python code down, so the two aren't measured together). Each run gets its own copy of the synthetic inputs, so the
+# memory run doesn't find the derived columns and merges saved by the timing run and measure the incremental path. A step that fails is recorded with its error and the
+# remaining steps for that size are skipped, which shows where the pipeline breaks as the registry grows.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+import usdr
+from synthetic import writeSyntheticData
+
+RESULTS_PATH = 'benchmarks/results.jsonl'
+SIZES = [10000, 100000, 1000000]
+
+# (name, function of the state dict) in pipeline order; each step stores what later steps need in the state
+STEPS = [
+    ('loadUSDR', lambda s: s.update(accts=usdr.loadUSDR())),
+    ('prepareAccounts', lambda s: s.update(accts=usdr.prepareAccounts(s['accts']))),
+    ('findDuplicates', lambda s: quietly(usdr.findDuplicates, s['accts'])),
+    ('normalizeUSDR', lambda s: usdr.normalizeUSDR(s['accts'])),
+    ('loadTwitter', lambda s: s.update(twitter=usdr.loadTwitter())),
+    ('prepareTwitter', lambda s: s.update(twitter=usdr.prepareTwitter(s['twitter']))),
+    ('loadFacebook', lambda s: s.update(facebook=usdr.loadFacebook())),
+    ('prepareFacebook', lambda s: s.update(facebook=usdr.prepareFacebook(s['facebook']))),
+    ('mergeTwitter', lambda s: s.update(twitter_merged=usdr.mergeTwitter(platformAccounts(s, 'twitter'), s['twitter']))),
+    ('mergeFacebook', lambda s: s.update(facebook_merged=usdr.mergeFacebook(platformAccounts(s, 'facebook'), s['facebook']))),
+    ('mergeTwitter unchanged', lambda s: usdr.mergeTwitter(platformAccounts(s, 'twitter'), s['twitter'])),
+    ('buildCube', lambda s: s.update(cube=usdr.buildCube(s['twitter_merged'], s['facebook_merged']))),
+    ('printCubeReport', lambda s: quietly(usdr.printCubeReport, s['cube'])),
+    ('ResultsTable', lambda s: s.update(table=usdr.ResultsTable())),
+    ('ResultsTable.query', lambda s: [s['table'].query(**query) for query in TABLE_QUERIES]),
+]
+
+# a few typical dashboard requests: first page, sorted, filtered, searched, deep page
+TABLE_QUERIES = [
+    {},
+    {'sort': 'organization'},
+    {'sort': 'last_posted_category', 'ascending': False, 'platform': 'twitter'},
+    {'agency': 81, 'recency': 'within last week'},
+    {'search': 'noaa', 'start': 1000},
+]
+
+def platformAccounts(state, service_key):
+    accts = state['accts']
+    return accts[accts['service_key'] == service_key]
+
+def quietly(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+def runSteps(memory=False):
+    state = {}
+    results = []
+    for name, step in STEPS:
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            step(state)
+            error = None
+        except Exception as e:
+            error = type(e).__name__ + ': ' + str(e)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+
+        results.append({'step': name, 'seconds': elapsed, 'peak_mb': peak / 2**20 if peak is not None else None, 'error': error})
+        if error:
+            break
+
+    return results
+
+# runSteps in a new directory holding only a copy of the synthetic inputs
+def runFresh(inputs, repo, memory=False):
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copytree(os.path.join(inputs, 'data'), os.path.join(directory, 'data'))
+        os.chdir(directory)
+        try:
+            return quietly(runSteps, memory)
+        finally:
+            os.chdir(repo)
+
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def benchmark(sizes, memory=True, output=RESULTS_PATH, workers=1):
+    commit = gitCommit()
+    usdr.useProcesses(workers)
+    repo = os.getcwd()
+    output = os.path.abspath(output)
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as inputs:
+            counts = writeSyntheticData(size, inputs)
+            timings = runFresh(inputs, repo)
+            peaks = runFresh(inputs, repo, True) if memory else [{}] * len(timings)
+
+        print('{0:,} accounts ({1:,} Twitter, {2:,} Facebook URLs)'.format(size, counts['twitter'], counts['facebook_urls']))
+        with open(output, 'a') as file:
+            for timing, peak in zip(timings, peaks):
+                record = {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                          'pandas': pd.__version__, 'workers': workers, 'size': size, 'step': timing['step'], 'seconds': round(timing['seconds'], 4),
+                          'peak_mb': round(peak['peak_mb'], 1) if peak.get('peak_mb') is not None else None, 'error': timing['error']}
+                file.write(json.dumps(record) + '\n')
+                print('   {0:<22} {1:>9.3f} s {2:>10} {3}'.format(record['step'], record['seconds'],
+                      '{:,.1f} MB'.format(record['peak_mb']) if record['peak_mb'] is not None else '', record['error'] or ''))
+
+# seconds per step and size for two commits (default: the last two in the results file), and the change between them
+def compare(commits=None, output=RESULTS_PATH):
+    results = pd.read_json(output, lines=True, dtype={'commit': str})
+    if not commits:
+        commits = list(results['commit'].drop_duplicates())[-2:]
+
+    # latest run of each step per commit
+    results = results[results['commit'].isin(commits)].drop_duplicates(['commit', 'size', 'step'], keep='last')
+    table = results.pivot_table(index=['size', 'step'], columns='commit', values='seconds', sort=False)[commits]
+    if len(commits) == 2:
+        table['change'] = (table[commits[1]] / table[commits[0]] - 1).map('{:+.0%}'.format)
+
+    with pd.option_context('display.max_rows', None, 'display.width', 120):
+        print(table)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the offline pipeline steps on synthetic registries.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='registry sizes to run (default: 10k, 100k, 1M)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', default=RESULTS_PATH, help='JSON-lines results file (default: ' + RESULTS_PATH + ')')
+    parser.add_argument('--workers', type=int, default=1, help='processes for the partitioned steps (default: 1, see usdr.useProcesses)')
+    parser.add_argument('--compare', nargs='*', metavar='commit', help='compare saved results for two commits instead of running')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(args.compare, args.output)
+    else:
+        benchmark(args.sizes, memory=not args.no_memory, output=args.output, workers=args.workers)
@@ -0,0 +1,42 @@
+# Compare the per-row lastPostedCategory with the vectorized lastPostedCategories on random post times, some of them
+# missing (accounts that have never posted).
+#
+#   $ python benchmarks/bench_recency.py [rows]      (from the repo root)
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from usdr.helpers import lastPostedCategory
+from usdr.recency import lastPostedCategories, lastPostedCategoriesAt
+
+from bench_usernames import timeit
+
+def main(rows=1000000):
+    rng = np.random.RandomState(0)
+    last_api_call = pd.Series(pd.Timestamp('2018-10-01') + pd.to_timedelta(rng.randint(0, 3600, rows), unit='s'))
+    last_posted_at = last_api_call - pd.to_timedelta(rng.exponential(60, rows), unit='D')
+    last_posted_at[rng.rand(rows) < 0.05] = pd.NaT
+
+    per_row_time, old = timeit(lambda: (last_api_call - last_posted_at).apply(lastPostedCategory))
+    vectorized_time, new = timeit(lambda: lastPostedCategories(last_posted_at, last_api_call))
+
+    # the per-row function puts accounts that never posted in "more than a year ago"
+    posted = last_posted_at.notnull()
+    assert (old[posted] == new[posted].astype(str)).all()
+    assert (new[~posted] == 'never posted').all()
+
+    snapshots = pd.date_range('2018-07-01', '2018-10-01', freq='W')
+    snapshots_time, _ = timeit(lambda: lastPostedCategoriesAt(last_posted_at, snapshots))
+
+    print('{0:,} accounts'.format(rows))
+    print('{0:<12} {1:>8.3f} s'.format('per row', per_row_time))
+    print('{0:<12} {1:>8.3f} s'.format('vectorized', vectorized_time))
+    print('{0:<12} {1:>8.1f}x'.format('speedup', per_row_time / vectorized_time))
+    print('{0:<12} {1:>8.3f} s  ({2} reference times)'.format('snapshots', snapshots_time, len(snapshots)))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,58 @@
+# Compare per-row get_username/generate_url with the vectorized get_usernames/generate_urls on a registry-sized
+# frame built by repeating the service URLs in data/DOC_accts.txt.
+#
+#   $ python benchmarks/bench_usernames.py [rows]      (from the repo root)
+
+import json
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from usdr.helpers import get_username, generate_url
+from usdr.usernames import get_usernames, generate_urls
+
+def timeit(func, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(rows=100000):
+    with open('data/DOC_accts.txt', 'r') as file:
+        sample = pd.DataFrame(json.load(file))[['service_key', 'service_url']]
+
+    accts = pd.concat([sample] * (rows // len(sample) + 1), ignore_index=True).iloc[:rows]
+    accts['service_key'] = accts['service_key'].astype('category')
+
+    def per_row():
+        df = accts.copy()
+        df['username'] = df['service_url'].apply(lambda x: get_username(x))
+        df['url_from_username'] = df.apply(generate_url, axis=1)
+        return df
+
+    def vectorized():
+        df = accts.copy()
+        df['username'] = get_usernames(df['service_key'], df['service_url'])
+        df['url_from_username'] = generate_urls(df['service_key'], df['username'])
+        return df
+
+    per_row_time, old = timeit(per_row)
+    vectorized_time, new = timeit(vectorized)
+
+    # both cover Twitter and Facebook, so those rows have to agree
+    rows_compared = accts['service_key'].isin(['twitter', 'facebook']).values
+    assert (old['username'][rows_compared].fillna('') == new['username'][rows_compared].fillna('')).all()
+
+    print('{0:,} accounts'.format(rows))
+    print('{0:<12} {1:>8.3f} s'.format('per row', per_row_time))
+    print('{0:<12} {1:>8.3f} s'.format('vectorized', vectorized_time))
+    print('{0:<12} {1:>8.1f}x'.format('speedup', per_row_time / vectorized_time))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
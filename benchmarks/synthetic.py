@@ -0,0 +1,125 @@
+# Synthetic registry, Twitter and Facebook results shaped like the real ones, for benchmarking at sizes we don't
+# have data for. USDR records are copies of the sample records in data/DOC_accts.txt (same platforms, agencies and
+# tags) with new IDs and a unique username in each service_url; the API results look like what fetchTwitter and
+# fetchFacebook save, for most of the Twitter/Facebook accounts.
+#
+#   $ python benchmarks/synthetic.py [accounts] [directory]      (from the repo root)
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from usdr.registry import saveUSDR
+from usdr.storage import saveFrame
+
+SAMPLE_PATH = 'data/DOC_accts.txt'
+
+def syntheticRegistry(accounts, seed=0):
+    rng = np.random.RandomState(seed)
+    with open(SAMPLE_PATH, 'r') as file:
+        sample = pd.DataFrame(json.load(file))
+
+    df = sample.iloc[np.arange(accounts) % len(sample)].reset_index(drop=True)
+    df['id'] = np.arange(1, accounts + 1)
+    df['service_url'] = df['service_url'].str.rstrip('/') + 'x' + df['id'].astype(str)
+
+    created = pd.Timestamp('2012-01-01') + pd.to_timedelta(rng.randint(0, 5 * 365 * 86400, accounts), unit='s')
+    df['created_at'] = created.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    df['updated_at'] = (created + pd.to_timedelta(rng.randint(0, 365 * 86400, accounts), unit='s')).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    return df
+
+# what fetchTwitter saves: one user record (with its latest status) per screen name found
+def syntheticTwitter(registry, found=0.85, never_posted=0.03, seed=1):
+    rng = np.random.RandomState(seed)
+    urls = registry.loc[registry['service_key'] == 'twitter', 'service_url']
+    screen_names = urls.str.extract(r'twitter\.com/@?([^/?\s]*)', expand=False).dropna()
+    screen_names = pd.unique(screen_names[rng.rand(len(screen_names)) < found])
+    n = len(screen_names)
+
+    last_api_call = pd.Timestamp('2018-10-01')
+    posted = last_api_call - pd.to_timedelta(rng.exponential(30 * 86400, n).astype('int64'), unit='s')
+    statuses = [{'created_at': created_at, 'id': status_id, 'text': 'status text'}
+                for created_at, status_id in zip(posted.strftime('%a %b %d %H:%M:%S +0000 %Y'), rng.randint(1, 2**62, n))]
+    for i in np.flatnonzero(rng.rand(n) < never_posted):
+        statuses[i] = None
+
+    return pd.DataFrame({
+        'id': rng.randint(1, 2**62, n),
+        'screen_name': screen_names,
+        'created_at': (last_api_call - pd.to_timedelta(rng.randint(365, 3650, n), unit='D')).strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        'verified': rng.rand(n) < 0.3,
+        'followers_count': rng.lognormal(8, 2, n).astype('int64'),
+        'friends_count': rng.lognormal(6, 1.5, n).astype('int64'),
+        'statuses_count': rng.lognormal(7, 2, n).astype('int64'),
+        'lang': rng.choice(['en', 'es'], n, p=[0.95, 0.05]),
+        'status': statuses,
+        'last_api_call': last_api_call,
+    })
+
+# what fetchFacebook saves: the URL lookups (by URL) and the page details (by ID)
+def syntheticFacebook(registry, found=0.9, never_posted=0.02, seed=2):
+    rng = np.random.RandomState(seed)
+    urls = registry.loc[registry['service_key'] == 'facebook', 'service_url']
+    usernames = pd.unique(urls.str.extract(r'facebook\.com/(?:.+/)*([\w.\-]+)', expand=False).dropna().str.lower())
+    n = len(usernames)
+    valid = rng.rand(n) < found
+    ids = (10**14 + np.arange(n)).astype(str)
+
+    by_url = pd.DataFrame({
+        'url': 'https://www.facebook.com/' + pd.Series(usernames),
+        'id': ids,
+        'name': usernames,
+        'is_valid': valid,
+        'error': np.where(valid, None, 'page is not available'),
+    })
+
+    last_api_call = pd.Timestamp('2018-10-01')
+    valid_ids = ids[valid]
+    m = len(valid_ids)
+    posted = (last_api_call - pd.to_timedelta(rng.exponential(20 * 86400, m).astype('int64'), unit='s')).strftime('%Y-%m-%dT%H:%M:%S+0000')
+    feeds = [{'data': [{'created_time': created_time, 'id': page_id + '_1', 'message': 'post text'}]}
+             for created_time, page_id in zip(posted, valid_ids)]
+    for i in np.flatnonzero(rng.rand(m) < never_posted):
+        feeds[i] = {'data': []}
+
+    by_id = pd.DataFrame({
+        'id': valid_ids,
+        'name': usernames[valid],
+        'username': usernames[valid],
+        'is_verified': rng.rand(m) < 0.3,
+        'fan_count': rng.lognormal(8, 2, m).astype('int64'),
+        'talking_about_count': rng.lognormal(3, 2, m).astype('int64'),
+        'category': rng.choice(['Government Organization', 'Public & Government Service'], m),
+        'feed': feeds,
+        'last_api_call': last_api_call,
+    })
+
+    return by_url, by_id
+
+# write a full set of saved results for the given number of accounts to directory/data, as the fetch stages would
+def writeSyntheticData(accounts, directory):
+    os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+    registry = syntheticRegistry(accounts)
+    twitter = syntheticTwitter(registry)
+    by_url, by_id = syntheticFacebook(registry)
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        saveUSDR(registry)
+        saveFrame(twitter, 'Twitter_API_Results')
+        saveFrame(by_url, 'Facebook_API_Results_by_URL')
+        saveFrame(by_id, 'Facebook_API_Results_by_ID')
+    finally:
+        os.chdir(cwd)
+
+    return {'accounts': len(registry), 'twitter': len(twitter), 'facebook_urls': len(by_url), 'facebook_ids': len(by_id)}
+
+if __name__ == '__main__':
+    print(writeSyntheticData(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, sys.argv[2] if len(sys.argv) > 2 else 'synthetic'))
@@ -6,3 +6,13 @@ twitter_access_key = ''
 twitter_access_secret = ''
 
 facebook_access_token = ''
+
+# optional: a YouTube Data API key; without one the fetch stage skips YouTube
+youtube_api_key = ''
+
+# optional: more Twitter credential sets (e.g. from other apps/accounts) to spread lookups across their rate limits.
+# When this is set, it's used instead of the single set of twitter_* keys above.
+# twitter_credentials = [
+#     {'consumer_key': '', 'consumer_secret': '', 'access_token_key': '', 'access_token_secret': ''},
+#     {'consumer_key': '', 'consumer_secret': '', 'access_token_key': '', 'access_token_secret': ''},
+# ]
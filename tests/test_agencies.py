@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from usdr.agencies import loadAgencyTreeMap
+from usdr.registry import saveUSDR
+from usdr.table import ResultsTable
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# sample records listed under a sub-agency and a top-level agency of the tree, and one the tree doesn't have
+def sampleAccounts():
+    with open(os.path.join(DATA_PATH, 'DOC_accts.txt'), 'r') as file:
+        accts = pd.DataFrame(json.load(file)[:12])
+    accts['agencies'] = ([[{'id': 1, 'name': 'Bureau of Labor Statistics (BLS)'}]] * 4 +
+                         [[{'id': 2, 'name': 'U.S. Department of Labor'}]] * 4 +
+                         [[{'id': 3, 'name': 'Department of Nowhere'}]] * 4)
+    return accts
+
+def test_agency_tree_map_saved_with_registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+    shutil.copy(os.path.join(DATA_PATH, 'USAgov_agencies.json'), 'data')
+
+    saveUSDR(sampleAccounts())
+    mapping = loadAgencyTreeMap().set_index('agency_id')['tree_id']
+
+    assert mapping[1] == 210172  # Bureau of Labor Statistics
+    assert mapping[2] == 210124  # U.S. Department of Labor
+    assert pd.isnull(mapping[3])
+
+def test_department_filter(monkeypatch):
+    monkeypatch.chdir(os.path.join(DATA_PATH, '..'))
+    table = ResultsTable(accts=sampleAccounts(), recency=pd.Series(dtype=object))
+
+    departments = dict(table.filterOptions()['department'])
+    assert list(departments.values()) == ['White House']
+
+    # the department's subtree takes in both Labor agencies, but not the one outside the tree
+    total, filtered, page = table.query(department=str(list(departments)[0]))
+    assert (total, filtered) == (12, 8)
+    assert table.query(department='1')[1] == 0
@@ -0,0 +1,64 @@
+import facebook
+import pytest
+
+from usdr.cache import APICache
+from usdr.facebook_api import FacebookURLFetcher
+
+# stand-in for facebook.GraphAPI: raises error (a Graph error dict) for every request, or for requests that
+# include one of the bad URLs
+class FakeGraph(object):
+    def __init__(self, bad=(), error=None):
+        self.bad = set(bad)
+        self.error = error
+        self.requests = 0
+
+    def get_objects(self, ids, **args):
+        self.requests += 1
+        if self.error:
+            raise facebook.GraphAPIError({'error': self.error})
+        if self.bad & set(ids):
+            raise facebook.GraphAPIError({'error': {'message': '(#803) Some of the aliases you requested do not exist', 'code': 803}})
+        return {i: {'id': 'id-' + i, 'name': 'Page ' + i} for i in ids}
+
+URLS = ['https://www.facebook.com/page' + str(i) for i in range(20)]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = APICache(path=str(tmp_path / 'cache.sqlite'))
+    yield cache
+    cache.close()
+
+def fetchWith(graph, cache, monkeypatch):
+    monkeypatch.setattr(FacebookURLFetcher, 'connect', lambda self: graph)
+    return FacebookURLFetcher().fetch(URLS, cache=cache)
+
+def test_auth_error_is_not_cached(cache, monkeypatch):
+    expired = FakeGraph(error={'message': 'Error validating access token', 'code': 190})
+    with pytest.raises(facebook.GraphAPIError):
+        fetchWith(expired, cache, monkeypatch)
+    assert cache.get_many('facebook_url', URLS) == {}
+
+    # once the token works again every URL is looked up
+    fixed = FakeGraph()
+    results, fetched_at, errors = fetchWith(fixed, cache, monkeypatch)
+    assert fixed.requests == 1
+    assert sorted(results) == sorted(URLS)
+
+def test_unknown_alias_is_cached(cache, monkeypatch):
+    results, fetched_at, errors = fetchWith(FakeGraph(bad=[URLS[5]]), cache, monkeypatch)
+    assert list(errors) == [URLS[5]]
+
+    again = FakeGraph()
+    results, fetched_at, errors = fetchWith(again, cache, monkeypatch)
+    assert again.requests == 0
+    assert results[URLS[5]]['error'].startswith('(#803)')
+
+def test_eviction_runs_every_n_writes(tmp_path):
+    cache = APICache(path=str(tmp_path / 'cache.sqlite'), max_entries=10, evict_every=25)
+    for i in range(4):
+        cache.set_many('twitter', {'user' + str(i) + '_' + str(j): {'n': j} for j in range(10)})
+    count = cache.db.execute('SELECT COUNT(*) FROM api_cache').fetchone()[0]
+    cache.close()
+
+    # evicted down to 10 after the 30th write, then 10 more since
+    assert count == 20
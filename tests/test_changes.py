@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from usdr.storage import saveFrame
+from usdr.transform import prepareTwitter, prepareFacebook
+from usdr.twitter_api import loadTwitter
+
+N = 500
+
+def twitterResults(rng):
+    posted = pd.Timestamp('2017-07-01', tz='UTC') - pd.to_timedelta(rng.integers(0, 400 * 24 * 3600, N), unit='s')
+    return pd.DataFrame({
+        'id': np.arange(N) + 1000,
+        'screen_name': ['Account' + str(i) for i in range(N)],
+        'followers_count': rng.integers(0, 10000, N),
+        'created_at': [t.strftime('%a %b %d %H:%M:%S +0000 %Y') for t in posted - pd.Timedelta(days=900)],
+        'status': [{'created_at': t.strftime('%a %b %d %H:%M:%S +0000 %Y'), 'text': 'post'} if i % 10 else None for i, t in enumerate(posted)],
+        'last_api_call': pd.Timestamp('2017-07-01 12:00'),
+    })
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+
+# derive everything, change about 2% of the records, and derive again incrementally: the result has to be the same
+# as deriving every record, dtypes included, although the unchanged records' values came back from Parquet
+def test_incremental_matches_full(data, capsys):
+    rng = np.random.default_rng(0)
+    results = twitterResults(rng)
+    saveFrame(results, 'Twitter_API_Results')
+    prepareTwitter(loadTwitter())
+
+    changed = rng.choice(N, N // 50, replace=False)
+    for i in changed[:5]:
+        results.at[i, 'status'] = {'created_at': 'Sat Jul 01 11:00:00 +0000 2017', 'text': 'new post'}
+    results.loc[changed[5:], 'screen_name'] = results.loc[changed[5:], 'screen_name'] + '_Renamed'
+    results['last_api_call'] = pd.Timestamp('2017-07-02 12:00')
+    saveFrame(results, 'Twitter_API_Results')
+
+    capsys.readouterr()
+    incremental = prepareTwitter(loadTwitter())
+    assert 'Twitter_API_Derived: 10 of 500 records new or changed.' in capsys.readouterr().out
+    full = prepareTwitter(loadTwitter(), incremental=False)
+
+    pd.testing.assert_frame_equal(incremental, full)
+    assert str(incremental['last_posted_at'].dtype).endswith('UTC]')
+    assert incremental.loc[changed[0], 'last_posted_at'] == pd.Timestamp('2017-07-01 11:00', tz='UTC')
+    assert incremental.loc[changed[5], 'screen_name'].endswith('_renamed')
+
+def test_unchanged_records_read_back(data, capsys):
+    feeds = [{'data': [{'created_time': '2017-06-' + str(10 + i % 20) + 'T10:00:00+0000'}]} if i % 7 else None for i in range(100)]
+    facebook = pd.DataFrame({'url': ['https://www.facebook.com/page' + str(i) for i in range(100)], 'feed': feeds,
+                             'last_api_call': pd.Timestamp('2017-07-01 12:00')})
+
+    first = prepareFacebook(facebook.copy())
+    again = prepareFacebook(facebook.copy())
+    assert 'Facebook_API_Derived: 0 of 100 records new or changed.' in capsys.readouterr().out
+
+    pd.testing.assert_frame_equal(again, first)
+    assert again['last_posted_at'].isnull().sum() == 15
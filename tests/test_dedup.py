@@ -0,0 +1,43 @@
+import pandas as pd
+
+from usdr.dedup import canonicalURLs, findDuplicates
+
+def keys(rows):
+    return canonicalURLs(pd.Series([key for key, url in rows]), pd.Series([url for key, url in rows])).tolist()
+
+def test_spellings_of_one_account_share_a_key():
+    assert len(set(keys([
+        ('twitter', 'https://twitter.com/#!/NASA'),
+        ('twitter', 'http://www.twitter.com/nasa?ref=ts'),
+        ('twitter', 'https://mobile.twitter.com/NASA/'),
+    ]))) == 1
+    assert keys([('facebook', 'https://www.facebook.com/profile.php?id=123&ref=ts'), ('facebook', 'https://facebook.com/123')]) == \
+        ['facebook:123', 'facebook:123']
+
+def test_generic_urls_are_kept_apart():
+    assert keys([
+        ('facebook', 'https://www.facebook.com/profile.php?id=1'),
+        ('facebook', 'https://www.facebook.com/profile.php?id=2'),
+        ('youtube', 'https://www.youtube.com/playlist?list=PLa'),
+        ('youtube', 'https://www.youtube.com/playlist?list=PLA'),
+        ('youtube', 'https://www.youtube.com/watch?v=abc'),
+    ]) == ['facebook:1', 'facebook:2', 'youtube.com/playlist?list=PLa', 'youtube.com/playlist?list=PLA', 'youtube.com/watch?v=abc']
+
+    # no key at all for a bare domain or a page type without the page
+    assert all(pd.isnull(key) for key in keys([
+        ('twitter', 'https://twitter.com/'),
+        ('twitter', 'https://twitter.com/#!/'),
+        ('youtube', 'https://www.youtube.com/watch'),
+        ('facebook', 'https://www.facebook.com/pages/'),
+    ]))
+
+def test_bare_domains_are_not_one_cluster():
+    accts = pd.DataFrame({
+        'id': [1, 2, 3],
+        'service_key': ['twitter'] * 3,
+        'service_url': ['https://twitter.com/', 'https://twitter.com/#!/', 'https://twitter.com/'],
+        'account': ['alpha', 'bravo', 'charlie'],
+        'organization': ['Office A', 'Office B', 'Office C'],
+    })
+    duplicates = findDuplicates(accts, save=False)
+    assert duplicates['cluster_id'].tolist() == [1, 2, 3]
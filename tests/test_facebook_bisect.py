@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import facebook
+import pytest
+
+from usdr.facebook_api import getObjectsBisecting, FacebookURLFetcher
+
+# Local stand-in for the Graph API's multi-ID lookup (GET /v3.1/?ids=a,b,c): every ID in server.bad fails the whole
+# request with server.bad_error naming the first of them (error 803 by default, like an unknown alias), and
+# server.error (e.g. an expired token) fails every request.
+class GraphHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        ids = parse_qs(urlparse(self.path).query)['ids'][0].split(',')
+        bad = [i for i in ids if i in self.server.bad]
+
+        if self.server.error:
+            status, body = 400, {'error': self.server.error}
+        elif bad:
+            status, body = 404, {'error': dict(self.server.bad_error, message=self.server.bad_error['message'] + ' (' + bad[0] + ')')
+                                 if self.server.bad_error else {'message': '(#803) Some of the aliases you requested do not exist: '
+                                                                + ','.join(bad), 'type': 'OAuthException', 'code': 803}}
+        else:
+            status, body = 200, {i: {'id': 'id-' + i, 'name': 'Page ' + i} for i in ids}
+
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def graph(monkeypatch):
+    server = HTTPServer(('127.0.0.1', 0), GraphHandler)
+    server.requests = 0
+    server.bad = set()
+    server.error = None
+    server.bad_error = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(facebook, 'FACEBOOK_GRAPH_URL', 'http://127.0.0.1:' + str(server.server_port) + '/')
+    yield server, facebook.GraphAPI(access_token='token', version='3.1')
+
+    server.shutdown()
+    server.server_close()
+
+URLS = ['https://www.facebook.com/page' + str(i) for i in range(50)]
+
+def test_one_bad_url_in_a_batch(graph):
+    server, api = graph
+    server.bad = {URLS[17]}
+
+    results, errors, requests_made = getObjectsBisecting(api, URLS)
+
+    assert list(errors) == [URLS[17]]
+    assert '803' in errors[URLS[17]]
+    assert sorted(results) == sorted(URLS[:17] + URLS[18:])
+    assert requests_made == server.requests <= 1 + 2 * 6
+
+def test_invalid_id_error_is_bisected(graph):
+    server, api = graph
+    server.bad = {URLS[4], URLS[40]}
+    server.bad_error = {'message': '(#100) Cannot query users by their username', 'type': 'OAuthException', 'code': 100}
+
+    results, errors, requests_made = getObjectsBisecting(api, URLS)
+
+    assert sorted(errors) == sorted([URLS[4], URLS[40]])
+    assert len(results) == 48
+
+# a bad field fails every request with code 100, whichever IDs are in it
+def test_field_error_is_raised(graph):
+    server, api = graph
+    server.error = {'message': '(#100) Tried accessing nonexisting field (fan_count) on node type (User)', 'type': 'OAuthException',
+                    'code': 100}
+
+    with pytest.raises(facebook.GraphAPIError) as e:
+        getObjectsBisecting(api, URLS)
+    assert 'nonexisting field' in str(e.value)
+    assert server.requests == 1
+
+# an error that looks like a lookup error but fails both halves of a chunk isn't about any one ID
+def test_same_error_in_both_halves_is_raised(graph):
+    server, api = graph
+    server.error = {'message': 'Unsupported get request. Please read the Graph API documentation', 'type': 'GraphMethodException',
+                    'code': 100, 'error_subcode': 33}
+
+    with pytest.raises(facebook.GraphAPIError):
+        getObjectsBisecting(api, URLS)
+    assert server.requests == 3
+
+def test_throttle_error_is_raised(graph):
+    server, api = graph
+    server.error = {'message': '(#4) Application request limit reached', 'type': 'OAuthException', 'code': 4}
+
+    with pytest.raises(facebook.GraphAPIError):
+        getObjectsBisecting(api, URLS)
+    assert server.requests == 1
+
+def test_auth_error_is_raised_without_bisecting(graph):
+    server, api = graph
+    server.error = {'message': 'Error validating access token: Session has expired', 'type': 'OAuthException', 'code': 190}
+
+    with pytest.raises(facebook.GraphAPIError) as e:
+        getObjectsBisecting(api, URLS)
+    assert 'access token' in str(e.value)
+    assert server.requests == 1
+
+# the fetcher marks the bad URL as an error and the others as valid pages
+def test_fetcher_batch(graph, monkeypatch):
+    server, api = graph
+    server.bad = {URLS[3]}
+    monkeypatch.setattr(FacebookURLFetcher, 'connect', lambda self: api)
+
+    results, fetched_at, errors = FacebookURLFetcher().fetch(URLS[:10])
+
+    assert list(errors) == [URLS[3]]
+    assert all(results[url]['is_valid'] for url in URLS[:10] if url != URLS[3])
@@ -0,0 +1,76 @@
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import usdr.joins
+from usdr.joins import hashJoin, IndexedJoin
+
+def rowCounts(df, columns):
+    return Counter(tuple(None if pd.isnull(v) else v for v in row) for row in df[columns].itertuples(index=False))
+
+# pd.merge's outer join, except that rows with a missing key match nothing and come out on their own
+def expectedJoin(left, right, on):
+    keyed = pd.merge(left[left[on].notnull()], right[right[on].notnull()], on=on, how='outer')
+    shared = (set(left.columns) & set(right.columns)) - {on}
+    unkeyed_left = left[left[on].isnull()].rename(columns={c: c + '_x' for c in shared})
+    unkeyed_right = right[right[on].isnull()].rename(columns={c: c + '_y' for c in shared})
+    return pd.concat([keyed, unkeyed_left, unkeyed_right], ignore_index=True)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_hash_join_matches_merge(seed):
+    rng = np.random.default_rng(seed)
+    pool = np.array(['k' + str(i) for i in range(15)] + [None], dtype=object)
+    left = pd.DataFrame({'key': rng.choice(pool, 30), 'a': np.arange(30), 'shared': rng.integers(0, 5, 30)})
+    right = pd.DataFrame({'key': rng.choice(pool, 25), 'b': np.arange(25) * 10, 'shared': rng.integers(0, 5, 25)})
+
+    joined = hashJoin(left, right, 'key')
+    expected = expectedJoin(left, right, 'key')
+
+    columns = ['key', 'a', 'shared_x', 'b', 'shared_y']
+    assert list(joined.columns) == columns
+    assert rowCounts(joined, columns) == rowCounts(expected, columns)
+
+    # left rows in their order, then the right rows nothing matched
+    from_left = joined['a'].notnull().values
+    assert from_left[:from_left.sum()].all()
+    assert (np.diff(joined['a'].values[from_left]) >= 0).all()
+
+def test_hash_join_different_key_names():
+    left = pd.DataFrame({'username': ['a', 'b', 'b', None], 'x': [1, 2, 3, 4]})
+    right = pd.DataFrame({'screen_name': ['b', 'c', None, 'b'], 'y': [10, 20, 30, 40]})
+
+    joined = hashJoin(left, right, 'username', 'screen_name')
+    expected = pd.concat([pd.merge(left.dropna(), right.dropna(), left_on='username', right_on='screen_name', how='outer'),
+                          left[left['username'].isnull()], right[right['screen_name'].isnull()]], ignore_index=True)
+
+    columns = ['username', 'x', 'screen_name', 'y']
+    assert rowCounts(joined, columns) == rowCounts(expected, columns)
+
+def test_indexed_join_rewrites_only_when_changed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+    saved = []
+    saveFrame = usdr.joins.saveFrame
+    monkeypatch.setattr(usdr.joins, 'saveFrame', lambda df, name: saved.append(name) or saveFrame(df, name))
+
+    left = pd.DataFrame({'key': ['a', 'b', 'c', None], 'x': [1, 2, 3, 4]})
+    right = pd.DataFrame({'key': ['b', 'c', 'd'], 'y': [10, 20, 30]})
+    join = IndexedJoin('test_merged', 'key', 'key')
+
+    first = join.join(left, right)
+    assert saved == ['test_merged', 'test_merged_keys']
+
+    # the same rows again: nothing written, same result
+    saved.clear()
+    again = join.join(left, right)
+    assert saved == []
+    pd.testing.assert_frame_equal(again, first)
+
+    # one changed value on one side is enough to write it again
+    right.loc[1, 'y'] = 21
+    changed = join.join(left, right)
+    assert saved == ['test_merged', 'test_merged_keys']
+    assert changed.loc[changed['key'] == 'c', 'y'].tolist() == [21]
@@ -0,0 +1,25 @@
+import json
+
+from usdr import metrics
+
+def test_metrics_written_through_one_handle(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    metrics.recordMetrics(path)
+    handle = metrics.METRICS_FILE
+
+    with metrics.stage('work', total=3) as s:
+        for i in range(3):
+            s.progress(api_calls=1)
+
+    # flushed at the end of the stage, without closing the file
+    assert metrics.METRICS_FILE is handle and not handle.closed
+    with open(path) as file:
+        events = [json.loads(line)['event'] for line in file]
+    assert events == ['start', 'progress', 'progress', 'progress', 'end']
+
+    metrics.recordMetrics(None)
+    assert handle.closed
+    with metrics.stage('unrecorded'):
+        pass
+    with open(path) as file:
+        assert len(file.readlines()) == 5
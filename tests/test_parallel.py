@@ -0,0 +1,31 @@
+import json
+import threading
+
+import pandas as pd
+
+from usdr import parallel
+from usdr.storage import decodeJSON
+
+# chunks run on worker processes (started from a clean process, while another thread holds a lock) come back in order
+def test_partitions_with_a_lock_held(monkeypatch):
+    monkeypatch.setattr(parallel, 'WORKERS', 2)
+    monkeypatch.setattr(parallel, 'CHUNK_SIZE', 10)
+    values = pd.Series([json.dumps({'n': i}) if i % 7 else None for i in range(45)])
+
+    lock = threading.Lock()
+    held = threading.Event()
+    release = threading.Event()
+    def hold():
+        with lock:
+            held.set()
+            release.wait(60)
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        decoded = parallel.mapPartitions(decodeJSON, values)
+    finally:
+        release.set()
+        thread.join()
+
+    assert decoded.equals(decodeJSON(values))
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from usdr.cube import platformFacts, NOT_FOUND
+from usdr.recency import lastPostedCategories
+
+def test_unfetched_rows_get_no_category():
+    posted = pd.Series(pd.to_datetime(['2017-06-30', None, None], utc=True))
+    fetched = pd.Series(pd.to_datetime(['2017-07-01', '2017-07-01', None]))
+
+    categories = lastPostedCategories(posted, fetched)
+
+    assert categories[0] == 'within last week'
+    assert categories[1] == 'never posted'
+    assert pd.isnull(categories[2])
+
+# a Facebook URL the API knows but that isn't a valid page counts as not found, not as never posted
+def test_invalid_facebook_pages_are_not_found():
+    merged = pd.DataFrame({
+        'id_usdr': [1, 2, 3],
+        'id_api': ['10', '20', None],
+        'username_api': ['a', 'b', None],
+        'is_verified': [True, None, None],
+        'is_valid': [True, False, None],
+        'last_posted_category': pd.Categorical(['never posted', None, None]),
+        'agencies': [[], [], []],
+    })
+
+    facts = platformFacts(merged, 'facebook')
+
+    assert facts['last_posted_category'].tolist() == ['never posted', NOT_FOUND, NOT_FOUND]
@@ -0,0 +1,91 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from usdr.cache import APICache
+from usdr.redirects import resolveRedirects
+
+# Stub site: /a -> /b -> /c (301s, c is a page), /loop1 <-> /loop2, /hop<n> -> /hop<n+1> forever, /gone is a 404 and
+# /slow answers after SLOW seconds
+SLOW = 2
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    ROUTES = {'/a': '/b', '/b': '/c', '/loop1': '/loop2', '/loop2': '/loop1'}
+
+    def do_HEAD(self):
+        self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+        if self.path in self.ROUTES:
+            self.redirect(self.ROUTES[self.path])
+        elif self.path.startswith('/hop'):
+            self.redirect('/hop' + str(int(self.path[len('/hop'):]) + 1))
+        elif self.path == '/gone':
+            self.reply(404)
+        elif self.path == '/slow':
+            time.sleep(SLOW)
+            self.reply(200)
+        else:
+            self.reply(200)
+
+    def redirect(self, location):
+        self.send_response(301)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RedirectHandler)
+    server.daemon_threads = True
+    server.requests = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, 'http://127.0.0.1:' + str(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = APICache(path=str(tmp_path / 'cache.sqlite'))
+    yield cache
+    cache.close()
+
+def test_redirect_chain(site, cache):
+    server, root = site
+    assert resolveRedirects([root + '/a'], cache=cache) == {root + '/a': root + '/c'}
+    chain, cached_at = cache.get_many('redirect', [root + '/a'])[root + '/a']
+    assert chain == [root + '/a', root + '/b', root + '/c']
+
+    # the second run comes from the cache
+    assert resolveRedirects([root + '/a'], cache=cache) == {root + '/a': root + '/c'}
+    assert server.requests['/a'] == 1
+
+def test_redirect_loop(site, cache):
+    server, root = site
+    assert resolveRedirects([root + '/loop1'], cache=cache) == {root + '/loop1': None}
+    assert cache.get_many('redirect', [root + '/loop1']) == {}
+
+def test_too_many_hops(site, cache):
+    server, root = site
+    assert resolveRedirects([root + '/hop0'], cache=cache, max_redirects=3) == {root + '/hop0': None}
+    assert '/hop3' in server.requests and '/hop4' not in server.requests
+    assert cache.get_many('redirect', [root + '/hop0']) == {}
+
+def test_timeout_is_not_cached(site, cache):
+    server, root = site
+    assert resolveRedirects([root + '/slow'], cache=cache, timeout=0.2) == {root + '/slow': None}
+    assert cache.get_many('redirect', [root + '/slow']) == {}
+
+def test_not_found_is_cached(site, cache):
+    server, root = site
+    assert resolveRedirects([root + '/gone'], cache=cache) == {root + '/gone': None}
+    assert cache.get_many('redirect', [root + '/gone'])[root + '/gone'][0] is None
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import usdr.registry
+from usdr.pipeline import Pipeline
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'DOC_accts.txt')
+PAGE_SIZE = 10
+
+# the first 30 sample records as the USDR API would list them (newest first, PAGE_SIZE to a page)
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    with open(SAMPLE_PATH, 'r') as file:
+        records = sorted(json.load(file)[:30], key=lambda r: r['updated_at'], reverse=True)
+
+    def fetchPage(session, page, progress=None):
+        if progress is not None:
+            progress.progress(api_calls=1)
+        return {'metadata': {'pages': -(-len(records) // PAGE_SIZE)}, 'results': records[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]}
+
+    monkeypatch.setattr(usdr.registry, 'fetchUSDRPage', fetchPage)
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+    return records
+
+def test_sync_after_stream(registry):
+    Pipeline(usdr_stream=True).run('registry')
+    saved = usdr.registry.loadFrame('USDR_accts')
+    assert saved['updated_at'].tolist() == [r['updated_at'] for r in registry]
+
+    # one record updated and one added since the download
+    updated = dict(registry[5], updated_at='2030-01-01T00:00:00.000Z', organization='Renamed')
+    added = dict(registry[0], id=999999999, updated_at='2030-01-02T00:00:00.000Z')
+    registry[:] = [added, updated] + registry[:5] + registry[6:]
+
+    accts = Pipeline(usdr_sync=True).run('registry').accts
+    assert len(accts) == 31
+    assert accts.set_index('id').loc[updated['id'], 'organization'] == 'Renamed'
+    assert pd.api.types.is_datetime64_any_dtype(accts['updated_at'])
+
+def test_sync_after_fetch(registry):
+    Pipeline().run('registry')
+    registry.insert(0, dict(registry[0], id=999999999, updated_at='2030-01-02T00:00:00.000Z'))
+
+    accts = Pipeline(usdr_sync=True).run('registry').accts
+    assert len(accts) == 31
+
+# registries saved with typed timestamps by the old --stream path still sync
+def test_sync_typed_timestamps(registry):
+    usdr.registry.saveUSDR(usdr.registry.applySchema(pd.DataFrame(registry), usdr.registry.USDR_DTYPES))
+    registry.insert(0, dict(registry[0], id=999999999, updated_at='2030-01-02T00:00:00.000Z'))
+
+    accts = Pipeline(usdr_sync=True).run('registry').accts
+    assert len(accts) == 31
+    assert usdr.registry.loadFrame('USDR_accts')['updated_at'].map(type).eq(str).all()
+
+# a checkpoint left behind after its NDJSON file was deleted is dropped rather than resumed on an empty file
+def test_stream_checkpoint_without_file(registry):
+    with open('data/USDR_accts.ndjson.checkpoint', 'w') as file:
+        json.dump({'page': 2, 'pages': 3, 'size': 5000, 'records': 20}, file)
+
+    assert usdr.registry.streamUSDR() == 30
+    chunks = list(usdr.registry.loadUSDR(chunksize=100))
+    assert chunks[0]['id'].tolist() == [r['id'] for r in registry]
+    assert not os.path.exists('data/USDR_accts.ndjson.checkpoint')
@@ -0,0 +1,37 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from usdr.storage import convertJSONResults, loadFrame
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def test_convert_json_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+
+    # the Facebook results as older versions saved them, and Twitter results as a list of records
+    shutil.copy(os.path.join(DATA_PATH, 'Facebook_API_Results_by_URL.json'), 'data')
+    ids = {'id': {'0': '1', '1': '2'}, 'fan_count': {'0': 10, '1': 20}, 'last_api_call': {'0': 1496318400000, '1': 1496404800000}}
+    with open('data/Facebook_API_Results_by_ID.json', 'w') as file:
+        json.dump(json.dumps(ids), file)
+    with open('data/Twitter_API_Results.json', 'w') as file:
+        json.dump([{'id': 1, 'screen_name': 'a', 'status': {'created_at': 'Wed Aug 27 13:08:45 +0000 2008'}}], file)
+
+    assert convertJSONResults() == ['Twitter_API_Results', 'Facebook_API_Results_by_URL', 'Facebook_API_Results_by_ID']
+    assert convertJSONResults() == []
+
+    urls = loadFrame('Facebook_API_Results_by_URL')
+    assert len(urls) == 4097
+    assert urls['url'].iloc[0] == 'https://www.facebook.com/100056459206'
+    assert urls['url'].iloc[9] == 'https://www.facebook.com/10150095515730117'
+    assert urls['share'].dropna().iloc[0].keys() == {'comment_count', 'share_count'}
+
+    saved_ids = loadFrame('Facebook_API_Results_by_ID')
+    assert saved_ids['last_api_call'].tolist() == [pd.Timestamp('2017-06-01 12:00'), pd.Timestamp('2017-06-02 12:00')]
+    assert saved_ids['fan_count'].tolist() == [10, 20]
+
+    tweets = loadFrame('Twitter_API_Results')
+    assert tweets['status'].iloc[0] == {'created_at': 'Wed Aug 27 13:08:45 +0000 2008'}
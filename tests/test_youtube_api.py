@@ -0,0 +1,53 @@
+from usdr.youtube_api import YouTubeFetcher, parseYouTubeURL
+
+# stand-in for YouTubeClient: channels found by ID, legacy username or handle
+class FakeYouTube(object):
+    def __init__(self):
+        self.requests = []
+
+    def get(self, resource, **params):
+        self.requests.append((resource, {k: v for k, v in params.items() if k not in ('part', 'maxResults')}))
+        if resource == 'playlistItems':
+            return []
+        if 'id' in params:
+            return [{'id': i} for i in params['id'].split(',') if i == 'UCchannel']
+        if params.get('forUsername') == 'legacyname':
+            return [{'id': 'UClegacy'}]
+        if params.get('forHandle') == 'NASA':
+            return [{'id': 'UCnasa'}]
+        return []
+
+def test_parse_youtube_urls():
+    assert parseYouTubeURL('https://www.youtube.com/channel/UCchannel') == ('channel', 'UCchannel')
+    assert parseYouTubeURL('https://www.youtube.com/user/legacyname') == ('user', 'legacyname')
+    assert parseYouTubeURL('https://www.youtube.com/@NASA') == ('handle', 'NASA')
+    assert parseYouTubeURL('https://www.youtube.com/c/NASA') == ('custom', 'NASA')
+    assert parseYouTubeURL('https://www.youtube.com/NASA') == ('custom', 'NASA')
+
+    # videos, playlists and embeds don't name a channel
+    assert parseYouTubeURL('https://www.youtube.com/watch?v=dQw4w9WgXcQ') == (None, None)
+    assert parseYouTubeURL('https://www.youtube.com/playlist?list=PL123') == (None, None)
+    assert parseYouTubeURL('https://www.youtube.com/embed/dQw4w9WgXcQ') == (None, None)
+
+def test_custom_urls_resolved_by_handle_or_username(monkeypatch):
+    client = FakeYouTube()
+    monkeypatch.setattr(YouTubeFetcher, 'connect', lambda self: client)
+    urls = ['https://www.youtube.com/channel/UCchannel', 'https://www.youtube.com/c/NASA', 'https://www.youtube.com/@NASA',
+            'https://www.youtube.com/legacyname', 'https://www.youtube.com/user/legacyname', 'https://www.youtube.com/c/gone',
+            'https://www.youtube.com/watch?v=abc']
+
+    results, fetched_at, errors = YouTubeFetcher().fetch(urls)
+
+    assert {url: channel['id'] for url, channel in results.items()} == {
+        'https://www.youtube.com/channel/UCchannel': 'UCchannel',
+        'https://www.youtube.com/c/NASA': 'UCnasa',
+        'https://www.youtube.com/@NASA': 'UCnasa',
+        'https://www.youtube.com/legacyname': 'UClegacy',
+        'https://www.youtube.com/user/legacyname': 'UClegacy',
+    }
+    # a custom URL that is neither a handle nor a username is reported, not just missing
+    assert list(errors) == ['https://www.youtube.com/c/gone']
+
+    # a video URL isn't looked up as a handle or username
+    assert not any('watch' in params.values() for resource, params in client.requests)
+
@@ -0,0 +1,26 @@
+# Importing usdr only defines functions; nothing is fetched, loaded or printed until you call them.
+# To run the whole pipeline (or just some stages) use usdr.Pipeline or `python -m usdr`.
+
+from usdr.registry import fetchUSDR, syncUSDR, streamUSDR, loadUSDR, loadAgencyTables, agencyAccounts
+from usdr.twitter_api import fetchTwitter, loadTwitter
+from usdr.facebook_api import fetchFacebook, loadFacebook, fetchFacebookURLs, fetchFacebookDetails
+from usdr.youtube_api import fetchYouTube, loadYouTube
+from usdr.fetchers import PlatformFetcher, RateLimiter, fetchPlatforms
+from usdr.redirects import resolveRedirects
+from usdr.helpers import chunks, check_missing_screen_name, get_username, generate_url, getLastTweet, getLastFacebookPost, getLastYouTubeVideo, lastPostedCategory
+from usdr.usernames import get_usernames, generate_urls
+from usdr.recency import lastPostedCategories, lastPostedCategoriesAt, RECENCY_BINS
+from usdr.joins import KeyIndex, IndexedJoin, hashJoin
+from usdr.transform import prepareAccounts, prepareTwitter, prepareFacebook, prepareYouTube, mergeTwitter, mergeFacebook, mergeYouTube, loadMerged
+from usdr.report import print3col, printReport, printCubeReport, summarizeReport, formatReport, saveReport, REPORT_FORMATS
+from usdr.cube import buildCube, aggregatePlatforms, loadCube, cubeSummary, ALL_AGENCIES
+from usdr.dedup import findDuplicates, loadDuplicates, canonicalURLs, nearDuplicatePairs
+from usdr.history import recordSnapshot, loadHistory, valuesAt, accountGrowth, agencyGrowth, HISTORY_METRICS
+from usdr.agencies import AgencyHierarchy, loadAgencyHierarchy
+from usdr.table import ResultsTable, TABLE_COLUMNS
+from usdr.cache import APICache
+from usdr.metrics import recordMetrics, stage
+from usdr.parallel import useProcesses, mapPartitions
+from usdr.storage import convertJSONResults
+from usdr.schema import applySchema, normalizeUSDR, normalizeTwitter, normalizeFacebook, memoryReport, printMemoryReport
+from usdr.pipeline import Pipeline, STAGES, PLATFORM_STAGES
@@ -0,0 +1,50 @@
+import argparse
+
+from usdr.pipeline import Pipeline, STAGES, PLATFORM_STAGES
+from usdr.report import REPORT_FORMATS
+
+# command line entry point, e.g. `python -m usdr fetch merge report`
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m usdr', description='Run U.S. Digital Registry pipeline stages.')
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help='stage(s) to run, in order: ' + ', '.join(STAGES) + ' (default: all), or one platform\'s fetch: '
+                             + ', '.join(PLATFORM_STAGES))
+    parser.add_argument('--usdr-workers', type=int, default=8,
+                        help='number of USDR API pages to fetch at once (default: 8)')
+    registry_mode = parser.add_mutually_exclusive_group()
+    registry_mode.add_argument('--sync', action='store_true',
+                        help='registry stage only fetches records updated since the last run')
+    registry_mode.add_argument('--stream', action='store_true',
+                        help='registry stage streams pages to data/USDR_accts.ndjson, resuming an interrupted download '
+                             '(bounds memory during the download only; the records are then read back whole)')
+    parser.add_argument('--fetch-workers', type=int, default=16,
+                        help='number of API requests the fetch stage makes at once, across all platforms (default: 16)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="number of processes that load, parse and derive columns for big frames (default: 1; 0 for one per core)")
+    parser.add_argument('--chunk-size', type=int, default=100000, metavar='ROWS',
+                        help='rows each of those processes works on at a time (default: 100000)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignore the API response cache in data/api_cache.sqlite and refetch every account')
+    parser.add_argument('--no-redirects', action='store_true',
+                        help="facebook stage doesn't follow redirects from URLs the Graph API couldn't find")
+    parser.add_argument('--no-history', action='store_true',
+                        help="fetch stages don't add their follower/fan counts to the snapshot history in data/history/")
+    parser.add_argument('--metrics', default='data/metrics.jsonl', metavar='FILE',
+                        help="append each stage's timings, memory use, API calls and rate limit waits to this JSON-lines file "
+                             "(default: data/metrics.jsonl; '' to turn off)")
+    parser.add_argument('--report-format', choices=REPORT_FORMATS, default='text',
+                        help='format of the report stage: ' + ', '.join(REPORT_FORMATS) + ' (default: text)')
+    parser.add_argument('--report-output', metavar='FILE',
+                        help='report stage writes the report to this file instead of printing it')
+    args = parser.parse_args(argv)
+
+    try:
+        Pipeline(usdr_workers=args.usdr_workers, usdr_sync=args.sync, usdr_stream=args.stream, use_cache=not args.no_cache,
+                 resolve_redirects=not args.no_redirects, metrics_path=args.metrics,
+                 report_format=args.report_format, report_output=args.report_output, fetch_workers=args.fetch_workers,
+                 record_history=not args.no_history, workers=args.workers or None, chunk_size=args.chunk_size).run(*args.stages)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == '__main__':
+    main()
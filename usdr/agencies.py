@@ -0,0 +1,140 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from usdr.storage import saveFrame, loadFrame, dataPath
+
+''' AGENCY HIERARCHY '''
+
+AGENCY_TREE_PATH = 'data/USAgov_agencies.json'
+
+class AgencyHierarchy(object):
+    '''
+    Parent/child agency tree (e.g. from data/USAgov_agencies.json) with a
+    precomputed closure table: one row per (agency, ancestor) pair, including
+    each agency as its own ancestor at distance 0. Rolling a metric up the tree
+    is then a single join against the closure table and a groupby, instead of
+    walking parent links agency by agency.
+    '''
+
+    def __init__(self, agencies):
+        # agencies has agency_id, title and parent_id (NaN for top-level agencies)
+        agencies = agencies.drop_duplicates('agency_id').set_index('agency_id')
+        self.titles = agencies['title']
+        self.parents = agencies['parent_id'].dropna().astype('int64')
+
+        # add one generation of ancestors at a time until every agency has reached the top of the tree
+        closure = pd.DataFrame({'agency_id': agencies.index.values, 'ancestor_id': agencies.index.values, 'distance': 0})
+        frontier = closure
+        for distance in range(1, len(agencies) + 1):
+            frontier = pd.DataFrame({'agency_id': frontier['agency_id'].values,
+                                     'ancestor_id': frontier['ancestor_id'].map(self.parents).values,
+                                     'distance': distance}).dropna()
+            if frontier.empty:
+                break
+            frontier['ancestor_id'] = frontier['ancestor_id'].astype('int64')
+            closure = pd.concat([closure, frontier], ignore_index=True)
+
+        # level 0 is the top of the tree (departments and independent agencies), level 1 their sub-agencies, ...
+        self.levels = closure.groupby('agency_id')['distance'].max()
+        closure['ancestor_level'] = closure['ancestor_id'].map(self.levels).values
+        self.closure = closure.sort_values(['agency_id', 'distance']).reset_index(drop=True)
+
+    @classmethod
+    def fromJSON(cls, path=AGENCY_TREE_PATH):
+        with open(path, 'r') as file:
+            records = json.load(file)
+
+        agencies = pd.DataFrame({
+            'agency_id': [record['id'] for record in records],
+            'title': [record['title'] for record in records],
+            'parent_id': [record['parent']['id'] if record.get('parent') else np.nan for record in records],
+        })
+
+        # parents that aren't in the file themselves become top-level agencies
+        parents = pd.DataFrame({
+            'agency_id': [record['parent']['id'] for record in records if record.get('parent')],
+            'title': [record['parent']['title'] for record in records if record.get('parent')],
+            'parent_id': np.nan,
+        })
+        parents = parents[~parents['agency_id'].isin(agencies['agency_id'])]
+
+        return cls(pd.concat([agencies, parents], ignore_index=True))
+
+    # agency IDs from the agency's parent up to the top of the tree
+    def ancestors(self, agency_id):
+        rows = self.closure[(self.closure['agency_id'] == agency_id) & (self.closure['distance'] > 0)]
+        return rows['ancestor_id'].tolist()
+
+    # Aggregate values per agency up the tree. With a level, each agency's rows count towards its ancestor at that
+    # level (level=0 gives department totals); without one, towards every ancestor, so each agency gets the total for
+    # its whole subtree. Agencies above the level, or not in the tree, are left out. Use aggfunc='nunique' on an
+    # account ID column to count accounts listed under several agencies in the same subtree once.
+    def rollup(self, df, values, level=None, agency_column='agency_id', aggfunc='sum'):
+        values = list(values)
+        if level is None:
+            joined = pd.merge(df[[agency_column] + values], self.closure[['agency_id', 'ancestor_id']],
+                              left_on=agency_column, right_on='agency_id')
+            rolled = joined.groupby('ancestor_id')[values].agg(aggfunc)
+        else:
+            # an agency has at most one ancestor at a given level, so that join is just a lookup
+            ancestor = self.closure[self.closure['ancestor_level'] == level].set_index('agency_id')['ancestor_id']
+            rolled = df[values].groupby(df[agency_column].map(ancestor).values).agg(aggfunc)
+            rolled.index = rolled.index.astype('int64')
+
+        rolled.insert(0, 'title', self.titles.reindex(rolled.index).values)
+        rolled.index.name = 'agency_id'
+
+        return rolled
+
+    # agency IDs in the subtree under an agency, itself included
+    def subtree(self, agency_id):
+        return self.closure.loc[self.closure['ancestor_id'] == agency_id, 'agency_id'].tolist()
+
+    # map agency names (e.g. USDR agency names, which use their own IDs) to agency IDs in the tree by normalized
+    # title; names that match no agency give NaN
+    def matchNames(self, names):
+        titles = pd.Series(self.titles.index.values, index=self.titles.map(normalizeAgencyName).values)
+        titles = titles[~titles.index.duplicated()]
+        return pd.Series(names).map(normalizeAgencyName).map(titles)
+
+# lower case without acronyms in parentheses, punctuation, "U.S." or filler words, so "U.S. Department of State"
+# and "Department of State (DOS)" match
+def normalizeAgencyName(name):
+    name = re.sub(r'\([^)]*\)', ' ', str(name).lower()).replace('u.s.', ' ').replace('&', ' and ')
+    name = re.sub(r'[^a-z0-9 ]', ' ', name)
+    return ' '.join(word for word in name.split() if word not in ('the', 'us', 'of', 'for', 'and', 'on'))
+
+HIERARCHY = None
+
+# the hierarchy from data/USAgov_agencies.json, built the first time it's asked for
+def loadAgencyHierarchy():
+    global HIERARCHY
+    if HIERARCHY is None:
+        HIERARCHY = AgencyHierarchy.fromJSON()
+    return HIERARCHY
+
+''' USDR AGENCIES IN THE TREE '''
+
+# USDR agencies have IDs of their own, so each is linked to a node of the tree by its name (see matchNames). The
+# mapping is saved as data/USDR_agency_tree.parquet, one row per USDR agency (agency_id, tree_id), with no tree_id for
+# agencies the tree doesn't have. saveUSDR() saves it again with the agency table it was built from.
+
+def mapUSDRAgencies(usdr_agencies, hierarchy=None):
+    hierarchy = loadAgencyHierarchy() if hierarchy is None else hierarchy
+    tree_ids = hierarchy.matchNames(usdr_agencies['name'].values)
+    return pd.DataFrame({'agency_id': usdr_agencies['agency_id'].values, 'tree_id': pd.array(tree_ids.values, dtype='Int64')})
+
+def saveAgencyTreeMap(usdr_agencies, hierarchy=None):
+    mapping = mapUSDRAgencies(usdr_agencies, hierarchy)
+    saveFrame(mapping, 'USDR_agency_tree')
+    return mapping
+
+# the saved mapping, built from the saved USDR agencies if they were saved before it was
+def loadAgencyTreeMap():
+    if not os.path.exists(dataPath('USDR_agency_tree')):
+        return saveAgencyTreeMap(loadFrame('USDR_agencies'))
+    return loadFrame('USDR_agency_tree')
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from usdr.helpers import chunks
+
+''' API RESPONSE CACHE '''
+
+# how long a cached API response stays fresh, in seconds, per platform
+DEFAULT_TTL = {
+    'twitter': 24 * 60 * 60,
+    'facebook': 24 * 60 * 60,
+    'facebook_url': 7 * 24 * 60 * 60,  # URL -> ID lookups rarely change
+    'redirect': 7 * 24 * 60 * 60,      # redirect chains followed by resolveRedirects
+    'youtube': 24 * 60 * 60,
+}
+
+class APICache(object):
+    '''
+    On-disk (SQLite) cache of API responses, one row per account, keyed by
+    (platform, id or username, field set). Entries older than the platform's TTL
+    are treated as missing, and once there are more than max_entries rows the
+    least recently used ones are evicted (checked every evict_every rows
+    written, rather than counting the table on every write). A payload of None
+    records that the API had nothing for that key, so we don't ask again until
+    it goes stale. Only answers about the key itself belong here: errors that
+    would fail any key (auth, throttling, network) must not be cached.
+    One connection is shared by every thread (e.g. platforms fetched at the
+    same time), so reads and writes take turns.
+    '''
+
+    def __init__(self, path='data/api_cache.sqlite', ttl=None, max_entries=500000, evict_every=10000):
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.written = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute('''CREATE TABLE IF NOT EXISTS api_cache (
+                               platform TEXT NOT NULL,
+                               key TEXT NOT NULL,
+                               fields TEXT NOT NULL,
+                               payload TEXT,
+                               fetched_at REAL NOT NULL,
+                               last_used REAL NOT NULL,
+                               PRIMARY KEY (platform, key, fields))''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS api_cache_last_used ON api_cache (last_used)')
+        self.db.commit()
+
+    # returns {key: (payload, fetched_at)} for the keys with a fresh entry
+    def get_many(self, platform, keys, fields=''):
+        fields = fieldsKey(fields)
+        oldest = time.time() - self.ttl.get(platform, 0)
+        found = {}
+
+        with self.lock:
+            # stay under SQLite's limit on query parameters
+            for chunk in chunks(list(keys), 500):
+                rows = self.db.execute('SELECT key, payload, fetched_at FROM api_cache WHERE platform = ? AND fields = ? AND fetched_at >= ? AND key IN ('
+                                       + ','.join('?' * len(chunk)) + ')', [platform, fields, oldest] + chunk)
+                for key, payload, fetched_at in rows:
+                    found[key] = (json.loads(payload), fetched_at)
+
+            now = time.time()
+            self.db.executemany('UPDATE api_cache SET last_used = ? WHERE platform = ? AND key = ? AND fields = ?',
+                                [(now, platform, key, fields) for key in found])
+            self.db.commit()
+
+        return found
+
+    # items is {key: payload}; payload may be None for keys the API didn't return
+    def set_many(self, platform, items, fields=''):
+        fields = fieldsKey(fields)
+        now = time.time()
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO api_cache (platform, key, fields, payload, fetched_at, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                                [(platform, key, fields, json.dumps(payload), now, now) for key, payload in items.items()])
+            self.db.commit()
+
+            self.written += len(items)
+            if self.written >= self.evict_every:
+                self.evict()
+                self.written = 0
+
+    def evict(self):
+        excess = self.db.execute('SELECT COUNT(*) FROM api_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.db.execute('DELETE FROM api_cache WHERE rowid IN (SELECT rowid FROM api_cache ORDER BY last_used LIMIT ?)', (excess,))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+# field lists can be long (see fetchFacebookDetails), so key on a hash of them
+def fieldsKey(fields):
+    return hashlib.sha1(fields.encode('utf-8')).hexdigest() if fields else ''
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from usdr.parallel import mapPartitions
+from usdr.storage import saveFrame, loadFrame, dataPath
+
+''' CHANGE DETECTION '''
+
+# Most API records come back exactly as they were the last time we fetched them, so the columns we derive from them
+# (last post time, parsed dates, lower-case screen names) would come out the same too. Each record gets a content
+# hash of everything the API returned except when we asked (last_api_call), and the derived columns are saved next to
+# it in data/<name>.parquet. On the next run only records whose (key, content hash) isn't saved are derived again;
+# the rest get the saved values.
+#
+# Columns computed from the time of the fetch, like last_posted_category, still change when nothing else does, so
+# they're left to the caller (they're cheap whole-column operations anyway).
+
+HASH_IGNORED = ['last_api_call', 'content_hash']
+
+# 64-bit hash of each row's contents, not counting when it was fetched. Nested values are hashed as text.
+def contentHashes(df, ignored=HASH_IGNORED):
+    df = df.drop([c for c in ignored if c in df], axis=1)
+    df = df.astype({c: str for c in df.columns[df.dtypes == object]})
+    return pd.util.hash_pandas_object(df, index=False).values
+
+class DerivedColumns(object):
+    '''
+    Columns derived from API records by derive(records) (a module-level
+    function returning a frame of the derived columns for the records it's
+    given, which only need the sources columns), saved with each record's key
+    and content hash as data/<name>.parquet so unchanged records aren't derived
+    again. Hashing and deriving are split between worker processes for big
+    frames (see usdr/parallel.py).
+    '''
+
+    def __init__(self, name, key, columns, derive, sources=None):
+        self.name = name
+        self.key = key
+        self.columns = list(columns)
+        self.derive = derive
+        self.sources = sources
+
+    # df with the derived columns set (and a content_hash column), deriving only the records that are new or changed.
+    # Without incremental, every record is derived.
+    def apply(self, df, incremental=True):
+        df = df.reset_index(drop=True)
+        df['content_hash'] = mapPartitions(contentHashes, df)
+
+        saved = self.load() if incremental else None
+        found = self.lookup(saved, df) if saved is not None else np.full(len(df), -1)
+        changed = np.flatnonzero(found < 0)
+
+        derived = pd.DataFrame(index=df.index)
+        if saved is not None:
+            derived = saved[self.columns].iloc[np.maximum(found, 0)].reset_index(drop=True)
+        if len(changed):
+            records = df.iloc[changed] if self.sources is None else df[self.sources].iloc[changed]
+            new = mapPartitions(self.derive, records).reset_index(drop=True)
+            if len(changed) == len(df):
+                derived = new
+            else:
+                derived = pd.concat([derived.drop(changed), new.set_axis(changed)]).sort_index()
+
+        for column in self.columns:
+            df[column] = derived[column].set_axis(df.index)
+
+        if saved is None or len(changed) or len(saved) != len(df):
+            saveFrame(df[[self.key, 'content_hash'] + self.columns], self.name)
+        if saved is not None:
+            print(self.name + ': ' + '{:,}'.format(len(changed)) + ' of ' + '{:,}'.format(len(df)) + ' records new or changed.')
+
+        return df
+
+    def load(self):
+        if not os.path.exists(dataPath(self.name)):
+            return None
+        saved = loadFrame(self.name)
+        if any(column not in saved for column in [self.key, 'content_hash'] + self.columns):
+            return None
+        return saved
+
+    # position of each record's (key, content hash) in the saved table, or -1
+    def lookup(self, saved, df):
+        saved_index = pd.MultiIndex.from_arrays([saved[self.key].astype(object).values, saved['content_hash'].values])
+        index = pd.MultiIndex.from_arrays([df[self.key].astype(object).values, df['content_hash'].values])
+        keep = ~saved_index.duplicated()
+        positions = saved_index[keep].get_indexer(index)
+        return np.where(positions >= 0, np.flatnonzero(keep)[np.maximum(positions, 0)], -1)
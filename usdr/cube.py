@@ -0,0 +1,126 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from usdr.recency import recencyLabels
+from usdr.schema import normalizeUSDR
+from usdr.storage import saveFrame, loadFrame, dataPath
+from usdr.transform import loadMerged
+
+''' AGGREGATE CUBE '''
+
+# Counts of distinct USDR records, usernames and API accounts per agency x platform x last posted category x
+# verified, saved as data/aggregate_cube.parquet by the aggregate stage so the report and dashboard can answer any
+# summary question from a few hundred rows instead of the merged frames.
+#
+# Distinct counts don't add up (an account can belong to several agencies, and a username can match more than one
+# API record), so the cube has a row for every combination of dimensions rolled up, like SQL's GROUP BY CUBE: a
+# dimension that's rolled up holds ALL_AGENCIES (agency_id) or None (last_posted_category, verified). Every number is
+# then read from a single row.
+
+ALL_AGENCIES = 0
+NOT_FOUND = 'not found'
+
+CUBE_DIMENSIONS = ['agency_id', 'platform', 'last_posted_category', 'verified']
+CUBE_MEASURES = ['usdr_records', 'usernames', 'api_accounts', 'found_accounts']
+
+# which merged columns hold each platform's username, verified flag and "found" flag (every Twitter API match counts
+# as found; a Facebook one only if it's a valid page). The YouTube API doesn't say whether a channel is verified.
+PLATFORM_COLUMNS = {
+    'twitter': {'username': 'username', 'verified': 'verified', 'found': None},
+    'facebook': {'username': 'username_api', 'verified': 'is_verified', 'found': 'is_valid'},
+    'youtube': {'username': 'username', 'verified': None, 'found': None},
+}
+
+# other platforms' merged frames can be passed by name, e.g. buildCube(twitter_merged, facebook_merged, youtube=...)
+def buildCube(twitter_merged, facebook_merged, **merged):
+    cube = aggregateMerged(twitter_merged, facebook_merged, **merged)
+
+    saveFrame(cube, 'aggregate_cube')
+
+    return cube
+
+def aggregateMerged(twitter_merged, facebook_merged, **merged):
+    return aggregatePlatforms(dict(twitter=twitter_merged, facebook=facebook_merged, **merged))
+
+# The cube for {platform: merged frame}: every platform's rows go into one table of facts, so each grouping set is
+# a single groupby over all the platforms at once
+def aggregatePlatforms(merged):
+    facts = pd.concat([platformFacts(frame, platform) for platform, frame in merged.items()], ignore_index=True)
+    facts['platform'] = pd.Categorical(facts['platform'], categories=list(merged))
+    facts.insert(0, 'row', np.arange(len(facts)))
+
+    # one row per (merged row, agency) for the per-agency counts
+    tables = normalizeUSDR(pd.DataFrame({'id': facts['row'], 'agencies': facts.pop('agencies').values}))
+    links = tables['account_agencies'].rename(columns={'account_id': 'row'})
+    names = tables['agencies'].set_index('agency_id')['name']
+
+    facts_by_agency = pd.merge(facts, links, on='row')
+    facts['agency_id'] = ALL_AGENCIES
+
+    cells = []
+    for by_agency, by_category, by_verified in itertools.product([True, False], repeat=3):
+        by = ['platform', 'agency_id'] + ['last_posted_category'] * by_category + ['verified'] * by_verified
+        counts = countDistinct(facts_by_agency if by_agency else facts, by)
+        for column in set(CUBE_DIMENSIONS[2:]) - set(by):
+            counts[column] = None
+        cells.append(counts)
+
+    cube = pd.concat(cells, ignore_index=True, sort=False)
+    cube['platform'] = pd.Categorical(cube['platform'].astype(str), categories=list(merged))
+    cube['agency_name'] = cube['agency_id'].map(names).where(cube['agency_id'] != ALL_AGENCIES, 'All agencies')
+    cube['last_posted_category'] = pd.Categorical(cube['last_posted_category'], categories=recencyLabels() + [NOT_FOUND])
+
+    return cube[CUBE_DIMENSIONS + ['agency_name'] + CUBE_MEASURES]
+
+# the columns the cube counts, from one platform's merged frame
+def platformFacts(merged, platform):
+    columns = PLATFORM_COLUMNS[platform]
+    found = merged['id_api'].notnull()
+    verified = (merged[columns['verified']] == True).values if columns['verified'] else np.zeros(len(merged), dtype=bool)
+    if columns['found']:
+        found &= (merged[columns['found']] == True)
+
+    return pd.DataFrame({
+        'platform': platform,
+        'usdr_records': merged['id_usdr'].values,
+        'usernames': merged[columns['username']].values,
+        'api_accounts': merged['id_api'].values,
+        'found_accounts': merged['id_api'].where(found).values,
+        'last_posted_category': merged['last_posted_category'].astype(object).where(found, NOT_FOUND).fillna(NOT_FOUND).values,
+        'verified': verified,
+        'agencies': merged['agencies'].values,
+    })
+
+def countDistinct(facts, by):
+    return facts.groupby(by, observed=True)[CUBE_MEASURES].nunique().reset_index()
+
+# the saved cube, building it from the saved merged frames the first time (with YouTube if it has been merged)
+def loadCube():
+    if not os.path.exists(dataPath('aggregate_cube')):
+        merged = {'youtube': loadFrame('youtube_merged')} if os.path.exists(dataPath('youtube_merged')) else {}
+        return buildCube(*loadMerged(), **merged)
+    return loadFrame('aggregate_cube')
+
+# The counts the report shows, for one agency (or all of them): a row per statistic and a column per platform, in
+# the order the platforms were aggregated (including any that had no accounts)
+def cubeSummary(cube, agency_id=ALL_AGENCIES):
+    cells = cube[cube['agency_id'] == agency_id].assign(platform=cube['platform'].astype(str))
+    platforms = list(cube['platform'].cat.categories) if hasattr(cube['platform'], 'cat') else list(pd.unique(cube['platform']))
+    all_categories = cells['last_posted_category'].isnull()
+    all_verified = cells['verified'].isnull()
+
+    totals = cells[all_categories & all_verified].set_index('platform')[['usdr_records', 'usernames', 'found_accounts']].T
+    verified = cells[all_categories & (cells['verified'] == True)].set_index('platform')[['api_accounts']].T
+    categories = cells[~all_categories & all_verified].pivot(index='last_posted_category', columns='platform', values='api_accounts')
+
+    summary = pd.concat([totals, verified, categories.reindex(recencyLabels())])
+    summary = summary.reindex(columns=platforms).fillna(0).astype(int)
+    summary.index = SUMMARY_LABELS + recencyLabels()
+    summary.columns.name = None
+
+    return summary
+
+SUMMARY_LABELS = ['Total USDR records', 'Unique usernames', 'Accounts found using APIs', 'Verified (with checkmark)']
@@ -0,0 +1,263 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from usdr.storage import saveFrame, loadFrame
+from usdr.usernames import get_usernames
+
+''' DUPLICATE ACCOUNTS '''
+
+# The same account is often registered more than once: under different spellings of its URL (http/https, www or
+# not, a trailing slash, a query string, upper case) or by different offices with slightly different organization
+# names. findDuplicates() gives every registry record a cluster_id, the smallest USDR ID among the records it
+# duplicates, in two passes:
+#
+# 1. Exact: each service_url is reduced to a canonical key (the platform and username where we can parse one,
+#    otherwise the URL without scheme, www., fragment or trailing slash); records with the same key match.
+# 2. Fuzzy: records on the same platform whose account names and organization names are both similar match. Names
+#    are compared as sets of character trigrams (Jaccard similarity), and candidate pairs come from an index of
+#    trigrams instead of comparing every pair: each name only indexes its rarest few trigrams (a prefix just long
+#    enough that any two names at least account_threshold similar must share one), so only names that might match
+#    end up in the same block.
+#
+# Matches are joined transitively, so a cluster is a connected component of the match graph.
+
+# characters that aren't part of an account name, e.g. 'NIST_Fire' and 'nistfire' are the same name
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+# URL parts that don't change which page it is
+URL_SCHEME = re.compile(r'^[a-z][a-z0-9+.\-]*://')
+URL_HOST_PREFIX = re.compile(r'^(?:www\d?|m|mobile)\.')
+URL_SUFFIX = re.compile(r'[?#].*$')
+
+# query values that say which page a URL is (facebook.com/profile.php?id=, youtube.com/watch?v=, playlist?list=)
+URL_PAGE_QUERY = re.compile(r'[?&](id|v|list)=([^&#]+)', re.IGNORECASE)
+
+# path words that name a kind of page rather than an account, so they're never taken as usernames, and URLs ending in
+# one only have a key if their query says which page they are
+PLATFORM_PATH_WORDS = ['watch', 'playlist', 'embed', 'pages', 'profile.php', 'user', 'channel', 'c', 'photos', 'people',
+                       'groups', 'company', 'showcase', 'in', 'home', 'search', 'hashtag', 'intent', 'share', 'sharer.php']
+
+# a block (names sharing an indexed trigram) bigger than this is skipped rather than compared pair by pair, and
+# candidate pairs are checked about BATCH_PAIRS at a time so memory stays bounded
+MAX_BLOCK = 2000
+BATCH_PAIRS = 2000000
+
+# Canonical key per service_url: '<service_key>:<username>' where the platform's pattern finds a username (see
+# get_usernames; a Facebook profile.php URL's username is its id), otherwise the lower-case URL without scheme, www.,
+# fragment or trailing slash, and without its query unless that says which page it is (its value keeps its case, since
+# video and playlist IDs are case-sensitive). URLs with no path (a bare
+# domain) and generic pages (e.g. youtube.com/watch without a video) get no key, since they'd match everything.
+def canonicalURLs(service_key, service_url):
+    raw = service_url.fillna('').str.strip().str.lower()
+    page_query = service_url.fillna('').str.extract(URL_PAGE_QUERY)
+    page_query[0] = page_query[0].str.lower()
+    query = ('?' + page_query[0] + '=' + page_query[1]).fillna('')
+
+    urls = raw.str.replace('/#!/', '/', regex=False)
+    urls = urls.str.replace(URL_SCHEME, '', regex=True).str.replace(URL_HOST_PREFIX, '', regex=True)
+    urls = urls.str.replace(URL_SUFFIX, '', regex=True).str.rstrip('/')
+    paths = urls.str.partition('/')[2]
+    generic = paths.str.rsplit('/', n=1).str[-1].isin(PLATFORM_PATH_WORDS) & (query == '')
+    urls = (urls + query).where((paths != '') & ~generic, '')
+
+    usernames = get_usernames(service_key, service_url.fillna(''))
+    usernames = usernames.where(~usernames.isin(PLATFORM_PATH_WORDS), None)
+    profile_ids = ((service_key == 'facebook').values & (page_query[0] == 'id').values & raw.str.contains('profile.php', regex=False).values)
+    usernames[profile_ids] = page_query[1][profile_ids]
+
+    keys = urls.astype(object)
+    named = usernames.notnull().values
+    keys[named] = service_key.astype(str)[named] + ':' + usernames[named].astype(str)
+
+    return keys.where(keys != '', None)
+
+# Cluster ID per registry record (indexed like accts, with canonical_url, cluster_id and cluster_size), saved as
+# USDR_duplicates. Records with no duplicate are their own cluster, with cluster_id their own ID.
+def findDuplicates(accts, account_threshold=0.8, organization_threshold=0.5, save=True):
+    n = len(accts)
+    ids = accts['id'].values
+    canonical = canonicalURLs(accts['service_key'], accts['service_url'])
+
+    # graph vertices are the records, then one per canonical URL, then one per distinct (platform, account, organization)
+    url_codes, urls = pd.factorize(canonical)
+    names = nameTable(accts)
+    named = np.flatnonzero(names['account'].notnull().values)
+    name_codes = names.iloc[named].groupby(list(names.columns), sort=False).ngroup().values
+    distinct_names = names.iloc[named].drop_duplicates().reset_index(drop=True)
+    left = [np.flatnonzero(url_codes >= 0), named]
+    right = [n + url_codes[url_codes >= 0], n + len(urls) + name_codes]
+
+    pairs = nearDuplicateNames(distinct_names, account_threshold, organization_threshold)
+    left.append(n + len(urls) + pairs['left'].values)
+    right.append(n + len(urls) + pairs['right'].values)
+
+    labels = connectedComponents(n + len(urls) + len(distinct_names), np.concatenate(left), np.concatenate(right))[:n]
+
+    # the smallest USDR ID in each cluster
+    cluster_ids = pd.Series(ids).groupby(labels).transform('min').values
+    duplicates = pd.DataFrame({'id': ids, 'canonical_url': canonical.values, 'cluster_id': cluster_ids}, index=accts.index)
+    duplicates['cluster_size'] = duplicates.groupby('cluster_id')['id'].transform('size')
+
+    if save:
+        saveFrame(duplicates.reset_index(drop=True), 'USDR_duplicates')
+
+    clustered = duplicates['cluster_size'] > 1
+    print('Found ' + '{:,}'.format(duplicates.loc[clustered, 'cluster_id'].nunique()) + ' groups of duplicate accounts covering '
+          + '{:,}'.format(clustered.sum()) + ' of ' + '{:,}'.format(n) + ' records.')
+
+    return duplicates
+
+# normalized (service_key, account, organization) per record, with None where there's no account name to compare
+def nameTable(accts):
+    accounts = accts['account'].fillna('').astype(str).str.lower().str.replace(NON_ALPHANUMERIC, '', regex=True)
+    organizations = accts['organization'].fillna('').astype(str).str.lower().str.replace(NON_ALPHANUMERIC, ' ', regex=True).str.strip()
+    names = pd.DataFrame({'service_key': accts['service_key'].astype(str).values, 'account': accounts.values,
+                          'organization': organizations.values}, dtype=object)
+    names.loc[accounts.values == ''] = None
+    return names
+
+# Pairs of similar names in a table of distinct (service_key, account, organization), as positions in it (left < right)
+# with their account and organization similarity. A missing organization doesn't count against a pair.
+def nearDuplicateNames(names, account_threshold=0.8, organization_threshold=0.5):
+    account_grams = trigrams(names['account'], pad=True)
+    account_index = gramIndex(account_grams, len(names))
+    sizes = account_index[0]
+
+    matches = []
+    for left, right in candidatePairs(names['service_key'].values[account_grams['row'].values], account_grams, account_threshold):
+        # names of very different lengths can't be similar enough
+        possible = np.minimum(sizes[left], sizes[right]) >= account_threshold * np.maximum(sizes[left], sizes[right]) - 1e-9
+        left, right = left[possible], right[possible]
+        similarity = jaccard(account_index, left, right)
+        similar = similarity >= account_threshold
+        matches.append(pd.DataFrame({'left': left[similar], 'right': right[similar], 'account_similarity': similarity[similar]}))
+
+    columns = {'left': np.int64, 'right': np.int64, 'account_similarity': float}
+    candidates = pd.concat(matches, ignore_index=True) if matches else pd.DataFrame({c: np.array([], dtype=t) for c, t in columns.items()})
+    candidates = candidates.drop_duplicates(['left', 'right']).sort_values(['left', 'right'], ignore_index=True)
+
+    organization_similarity = jaccard(gramIndex(trigrams(names['organization']), len(names)), candidates['left'].values, candidates['right'].values)
+    candidates = candidates.assign(organization_similarity=organization_similarity)
+    matches = (organization_similarity >= organization_threshold) | np.isnan(organization_similarity)
+
+    return candidates[matches].reset_index(drop=True)
+
+# Near-duplicate names in the registry for review: service_key, the two account and organization names (as
+# normalized) and their similarity, most similar first
+def nearDuplicatePairs(accts, account_threshold=0.8, organization_threshold=0.5):
+    names = nameTable(accts).dropna(subset=['account']).drop_duplicates().reset_index(drop=True)
+    pairs = nearDuplicateNames(names, account_threshold, organization_threshold)
+    left = names.loc[pairs['left']].reset_index(drop=True)
+    right = names.loc[pairs['right']].reset_index(drop=True)
+    return pd.DataFrame({
+        'service_key': left['service_key'],
+        'account_left': left['account'], 'account_right': right['account'],
+        'organization_left': left['organization'], 'organization_right': right['organization'],
+        'account_similarity': pairs['account_similarity'], 'organization_similarity': pairs['organization_similarity'],
+    }).sort_values(['account_similarity', 'organization_similarity'], ascending=False, ignore_index=True)
+
+# (row, gram) for the distinct character trigrams of each non-empty string; with pad, start and end count too, so
+# short names have enough trigrams to compare
+def trigrams(strings, pad=False):
+    strings = strings.fillna('').astype(str).values
+    if pad:
+        strings = np.array(['^' + s + '$' if s else '' for s in strings], dtype=object)
+    rows = []
+    grams = []
+    for row, s in enumerate(strings):
+        s_grams = set(s[i:i + 3] for i in range(len(s) - 2)) if len(s) >= 3 else ({s} if s else set())
+        rows.extend([row] * len(s_grams))
+        grams.extend(s_grams)
+    gram_codes = pd.factorize(pd.Series(grams, dtype=object))[0]
+    return pd.DataFrame({'row': np.array(rows, dtype=np.int64), 'gram': gram_codes.astype(np.int64)})
+
+# Pairs of rows that share a block, a batch at a time: (block, gram) for the first |grams| - ceil(threshold * |grams|)
+# + 1 of each row's grams, rarest first. Two rows with Jaccard similarity >= threshold always share one of those
+# prefix grams, so nothing that could match is missed (unless its block is over MAX_BLOCK), and since the prefixes
+# hold the rarest grams the blocks stay small. Each batch holds whole blocks and about batch_pairs pairs; a pair can
+# come up in more than one block.
+def candidatePairs(blocks, grams, threshold, batch_pairs=BATCH_PAIRS):
+    if not len(grams):
+        return
+
+    # a row's grams ordered by how many rows have them (ties broken by gram, so every row uses the same order)
+    frequency = np.bincount(grams['gram'].values)
+    grams = grams.assign(frequency=frequency[grams['gram'].values]).sort_values(['row', 'frequency', 'gram'], kind='stable')
+    position = grams.groupby('row').cumcount().values
+    size = grams.groupby('row')['gram'].transform('size').values
+    prefix = size - np.ceil(threshold * size - 1e-9).astype(np.int64) + 1
+    indexed = grams[position < prefix]
+
+    # block codes are (platform, gram), so only names on the same platform are compared
+    block_codes = pd.factorize(pd.MultiIndex.from_arrays([blocks[indexed.index.values], indexed['gram'].values]))[0]
+    order = np.argsort(block_codes, kind='stable')
+    block_codes = block_codes[order]
+    rows = indexed['row'].values[order]
+
+    block_sizes = np.bincount(block_codes)
+    block_ends = np.cumsum(block_sizes)
+    block_pairs = np.where(block_sizes <= MAX_BLOCK, block_sizes * (block_sizes - 1) // 2, 0)
+    block_batches = np.cumsum(block_pairs) // batch_pairs
+
+    for batch in np.unique(block_batches[block_pairs > 0]):
+        # every pair within each block: entry i pairs with the entries after it up to the end of its block
+        in_batch = (block_batches == batch) & (block_pairs > 0)
+        positions = np.flatnonzero(in_batch[block_codes])
+        partners = block_ends[block_codes[positions]] - positions - 1
+        first = np.repeat(positions, partners)
+        second = np.arange(partners.sum()) - np.repeat(np.cumsum(partners) - partners, partners) + np.repeat(positions + 1, partners)
+
+        left = np.minimum(rows[first], rows[second])
+        right = np.maximum(rows[first], rows[second])
+        distinct = left != right
+        yield left[distinct], right[distinct]
+
+# (sizes, starts, sorted (row, gram) keys, grams in that order, number of grams) for looking up the gram sets of
+# rows 0 to n_rows - 1
+def gramIndex(grams, n_rows):
+    rows = grams['row'].values
+    gram_codes = grams['gram'].values
+    order = np.lexsort((gram_codes, rows))
+    sizes = np.bincount(rows, minlength=n_rows)
+    n_grams = gram_codes.max() + 1 if len(gram_codes) else 1
+    return sizes, np.concatenate([[0], np.cumsum(sizes)]), rows[order] * n_grams + gram_codes[order], gram_codes[order], n_grams
+
+# Jaccard similarity of the gram sets of rows left[i] and right[i] (NaN where either has no grams)
+def jaccard(index, left, right):
+    sizes, starts, keys, gram_codes, n_grams = index
+
+    # look up whether right[i] has each of left[i]'s grams
+    counts = sizes[left]
+    pair = np.repeat(np.arange(len(left)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    wanted = right[pair] * n_grams + gram_codes[starts[left][pair] + offsets]
+    found = keys[np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)] == wanted if len(keys) else np.zeros(0, dtype=bool)
+    shared = np.bincount(pair, weights=found, minlength=len(left))
+
+    union = sizes[left] + sizes[right] - shared
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((sizes[left] > 0) & (sizes[right] > 0), shared / union, np.nan)
+
+# component label per vertex of an undirected graph given as edge arrays: every vertex is hooked to the smallest
+# label among its neighbours, then labels are followed to their roots, until nothing changes
+def connectedComponents(n, left, right):
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[left], low)
+        np.minimum.at(hooked, labels[right], low)
+        while True:
+            jumped = hooked[hooked]
+            if (jumped == hooked).all():
+                break
+            hooked = jumped
+        if (hooked == labels).all():
+            return labels
+        labels = hooked
+
+# load saved cluster IDs, reading only the given columns if any
+def loadDuplicates(columns=None):
+    return loadFrame('USDR_duplicates', columns=columns)
@@ -0,0 +1,250 @@
+import re
+
+import pandas as pd
+import facebook  # This is @mobolic's Facebook-SDK wrapper: https://github.com/mobolic/facebook-sdk
+
+from usdr.fetchers import PlatformFetcher
+from usdr.joins import hashJoin
+from usdr.redirects import resolveRedirects
+from usdr.storage import saveFrame, loadFrame, frameColumns
+from usdr.schema import applySchema, FACEBOOK_DTYPES
+
+''' FACEBOOK API '''
+
+# settings is only needed once we actually call the API, so importing usdr works without API keys
+def getGraphAPI():
+    import settings  # Be sure to add your platform API consumer keys/secrets to settings.py or this won't work
+    return facebook.GraphAPI(access_token=settings.facebook_access_token, version='3.1')
+
+# Graph API error codes that mean we're being throttled rather than that an ID in the chunk is bad
+GRAPH_RATE_LIMIT_CODES = (4, 17, 32, 613)
+
+# Graph API error codes for an ID or alias it can't look up (803: alias doesn't exist, 100: invalid parameter). Only
+# these can be caused by one bad key in a multi-ID request; anything else (an expired token, missing permissions,
+# throttling, a server error) would fail for every key, so it's raised instead of bisected. 100 is also what a bad
+# field or any other invalid parameter gives, so it only counts when its subcode or message is about the object.
+GRAPH_LOOKUP_ERROR_CODES = (100, 803)
+GRAPH_LOOKUP_SUBCODES = (33,)
+GRAPH_LOOKUP_MESSAGE = re.compile(r'username|alias|object with id|does not exist|unsupported get request', re.IGNORECASE)
+
+# Graph rejects a whole multi-ID request if any one ID is bad, so when a chunk fails with a lookup error we split it
+# in half and retry each half until the bad IDs are requested on their own. Each bad ID costs at most two extra
+# requests per halving (12 for a chunk of 50), and which IDs are bad comes from which requests fail, not from the
+# wording of the error message. The error for a bad ID names it, so if both halves fail with the very same error
+# it's about the request rather than an ID, and it's raised. Returns (results by ID, error message by bad ID, number of
+# requests made).
+def getObjectsBisecting(graph, chunk, throttle=None, **args):
+    results = {}
+    errors = {}
+    requests_made = 0
+
+    # the lookup error a request failed with, or None if it didn't
+    def request(items):
+        nonlocal requests_made
+        requests_made += 1
+        if throttle is not None:
+            throttle()
+        try:
+            results.update(graph.get_objects(ids=items, **args))
+            return None
+        except facebook.GraphAPIError as e:
+            if not isLookupError(e):
+                raise
+            return e
+
+    error = request(chunk)
+    pending = [(chunk, error)] if error is not None else []
+    while pending:
+        items, error = pending.pop()
+        if len(items) == 1:
+            errors[items[0]] = str(error)
+            continue
+
+        middle = len(items) // 2
+        failed = [(half, request(half)) for half in (items[:middle], items[middle:])]
+        failed = [(half, e) for half, e in failed if e is not None]
+        if len(failed) == 2 and graphErrorKey(failed[0][1]) == graphErrorKey(failed[1][1]):
+            raise failed[0][1]
+        pending += reversed(failed)
+
+    return results, errors, requests_made
+
+def isLookupError(e):
+    code = getGraphErrorCode(e)
+    if code == 100:
+        error = e.result.get('error', {}) if isinstance(e.result, dict) else {}
+        return error.get('error_subcode') in GRAPH_LOOKUP_SUBCODES or bool(GRAPH_LOOKUP_MESSAGE.search(str(error.get('message', ''))))
+    return code in GRAPH_LOOKUP_ERROR_CODES
+
+def graphErrorKey(e):
+    error = e.result.get('error', {}) if isinstance(e.result, dict) else {}
+    return error.get('code'), error.get('error_subcode'), str(e)
+
+def getGraphErrorCode(e):
+    try:
+        return e.result['error']['code']
+    except (KeyError, TypeError):
+        return None
+
+def printErrorSummary(errors, extra_requests):
+    if errors:
+        print('\r' + str(len(errors)) + ' IDs rejected by the API, isolated with ' + str(extra_requests) + ' extra requests ('
+              + '{:.1f}'.format(extra_requests / len(errors)) + ' per bad ID):')
+        print(list(errors))
+
+def fetchFacebook(url_list, cache=None, resolve_redirects=True, executor=None):
+    df_urls = fetchFacebookURLs(url_list, cache=cache, executor=executor)
+
+    # replace the not-found rows that redirect to a page the API knows
+    if resolve_redirects:
+        redirected = fetchRedirectedURLs(df_urls, cache=cache, executor=executor)
+        df_urls = pd.concat([df_urls[~df_urls['url'].isin(redirected['url'])], redirected], ignore_index=True, sort=False)
+
+    # save results for later reference
+    saveFrame(df_urls, 'Facebook_API_Results_by_URL')
+
+    id_list = df_urls[df_urls['error'].isnull()]['id'].tolist()
+
+    df_ids = fetchFacebookDetails(id_list, cache=cache, executor=executor)
+
+    # save results for later reference
+    saveFrame(df_ids, 'Facebook_API_Results_by_ID')
+
+    df_merged = hashJoin(df_urls, df_ids, 'id', suffixes=('_url', '_id'))
+
+    return applySchema(df_merged, FACEBOOK_DTYPES)
+
+# Second fetchFacebookURLs pass for the URLs the Graph API couldn't find: follow their redirects and look up only the
+# URLs they lead to that haven't been looked up already. Returns a row per original URL whose redirect turned out to
+# be a valid page, with the page it led to in redirected_to, so the rows still merge with USDR on the original URL.
+def fetchRedirectedURLs(df_urls, cache=None, executor=None):
+    notfound_urls = df_urls.loc[df_urls['error'].notnull(), 'url'].tolist() if 'error' in df_urls else []
+    resolved = resolveRedirects(notfound_urls, cache=cache)
+
+    redirects = pd.DataFrame([(old_url, new_url) for old_url, new_url in resolved.items() if new_url and new_url != old_url],
+                             columns=['url', 'redirected_to'])
+    redirects = redirects[~redirects['redirected_to'].isin(df_urls['url'])]
+
+    print('Found ' + str(redirects['redirected_to'].nunique()) + ' new URLs')
+
+    if redirects.empty:
+        return redirects
+
+    df_new = fetchFacebookURLs(redirects['redirected_to'].tolist(), cache=cache, executor=executor).rename(columns={'url': 'redirected_to'})
+    if 'is_valid' not in df_new:
+        return redirects.iloc[:0]
+
+    return pd.merge(redirects, df_new[df_new['is_valid'] == True], how='inner', on='redirected_to')
+
+# load saved Facebook API results (by URL and by ID, merged on ID), reading only the given columns if any.
+# Columns found in both files come back with _url/_id suffixes, and can be asked for by either name.
+def loadFacebook(columns=None):
+    url_columns = None
+    id_columns = None
+
+    if columns is not None:
+        # a column in both files has to be read from both, so the merge suffixes it the same way as a full load
+        wanted = set(columns) | {c[:-len('_url')] for c in columns if c.endswith('_url')} | {c[:-len('_id')] for c in columns if c.endswith('_id')}
+        url_columns = ['id'] + [c for c in frameColumns('Facebook_API_Results_by_URL') if c != 'id' and c in wanted]
+        id_columns = ['id'] + [c for c in frameColumns('Facebook_API_Results_by_ID') if c != 'id' and c in wanted]
+
+    df_urls = loadFrame('Facebook_API_Results_by_URL', columns=url_columns)
+    df_ids = loadFrame('Facebook_API_Results_by_ID', columns=id_columns)
+
+    df_merged = hashJoin(df_urls, df_ids, 'id', suffixes=('_url', '_id'))
+
+    if columns is not None:
+        df_merged = df_merged[[c for c in df_merged.columns if c in columns]]
+
+    return applySchema(df_merged, FACEBOOK_DTYPES)
+
+def fetchFacebookDetails(id_list, cache=None, executor=None):
+    fetcher = FacebookDetailsFetcher()
+    results, fetched_at, errors = fetcher.fetch(id_list, cache=cache, executor=executor)
+
+    printErrorSummary(errors, fetcher.extra_requests)
+
+    df = pd.DataFrame.from_dict(results, orient='index')
+    # UTC, like the timestamps the API returns
+    df['last_api_call'] = pd.to_datetime([fetched_at[fb_id] for fb_id in df.index], unit='s')
+
+    total_results = len(results)
+
+    print('\rFound information for ' + str(total_results) + ' IDs.')
+
+    return df
+
+def fetchFacebookURLs(url_list, cache=None, executor=None):
+    fetcher = FacebookURLFetcher()
+    results, fetched_at, errors = fetcher.fetch(url_list, cache=cache, executor=executor)
+
+    printErrorSummary(errors, fetcher.extra_requests)
+
+    for error_url, error in errors.items():
+        results[error_url] = {'error': error}
+
+    df = pd.DataFrame.from_dict(results, orient='index')
+
+    total_results = len(results)
+    valid_results = df['is_valid'].sum() if 'is_valid' in df else 0
+
+    print('\rFound information for ' + str(total_results) + ' URLs. ' + str(valid_results) + ' are valid Facebook pages.')
+
+    # URL as index will cause issues later; make URL its own column and reindex
+    df.index.name='url'
+    df.reset_index(inplace=True)
+
+    return df
+
+class FacebookFetcher(PlatformFetcher):
+    '''
+    Graph API lookups of up to 50 IDs or URLs per request, bisecting
+    requests the API rejects to find the bad keys.
+    '''
+
+    title = 'Facebook API'
+    batch_size = 50   # FB API limits to 50 ids provided
+    max_workers = 4
+    # the Graph API answers with a throttling error (GRAPH_RATE_LIMIT_CODES) when we go over its limits
+    rate_limit = None
+
+    # requests beyond one per batch, spent bisecting batches with bad keys
+    extra_requests = 0
+
+    def connect(self):
+        return getGraphAPI()
+
+    def finish(self, graph, progress):
+        self.extra_requests = progress.counts.get('api_calls', 0) - progress.total
+
+    def fetchBatch(self, graph, batch):
+        args = {'fields': self.fields} if self.fields else {}
+        results, errors, requests_made = getObjectsBisecting(graph, batch, throttle=self.throttle, **args)
+        return results, errors, requests_made
+
+class FacebookURLFetcher(FacebookFetcher):
+    # first API call to find Facebook IDs for valid page/user URLs
+    name = 'facebook_url'
+    stage_name = 'fetchFacebookURLs'
+    noun = 'URLs'
+
+    def fetchBatch(self, graph, batch):
+        results, errors, requests_made = FacebookFetcher.fetchBatch(self, graph, batch)
+        for details in results.values():
+            if 'name' in details:
+                details['is_valid'] = True
+                details['error'] = None
+            else:
+                details['is_valid'] = False
+                details['error'] = 'page is not available'
+        return results, errors, requests_made
+
+    # URLs the API can't look up (see isLookupError) are cached with their error, and show up in the results
+    def errorPayload(self, error):
+        return {'error': error}
+
+class FacebookDetailsFetcher(FacebookFetcher):
+    name = 'facebook'
+    stage_name = 'fetchFacebookDetails'
+    noun = 'IDs'
+    fields = "about,can_checkin,category,category_list,checkins,contact_address,cover,description,display_subtext,displayed_message_response_time,emails,fan_count,featured_video,general_info,hours,is_always_open,is_community_page,is_eligible_for_branded_content,is_permanently_closed,is_unclaimed,is_verified,link,location,mission,name,name_with_location_descriptor,overall_star_rating,parent_page,phone,rating_count,talking_about_count,username,website,verification_status,feed.limit(1){created_time,story,status_type,id,permalink_url}"
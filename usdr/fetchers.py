@@ -0,0 +1,178 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from usdr.helpers import chunks
+from usdr.metrics import stage
+
+''' PLATFORM FETCHERS '''
+
+# Every platform lookup does the same thing: drop empty and duplicate keys, take what it can from the cache, split
+# the rest into batches the API accepts, call the API for each batch, cache what comes back and count it. A
+# PlatformFetcher does all of that; a platform is a subclass that declares its batch size, how many batches may be
+# in flight at once, its rate limit and field set, and implements fetchBatch() for one batch.
+#
+# Batches run on a thread pool that can be shared between platforms, so fetchPlatforms() can run every platform's
+# lookups at the same time and the whole fetch takes as long as the slowest platform instead of all of them added up.
+
+class PlatformFetcher(object):
+    '''
+    Base class for one platform's API lookups. Subclasses set the class
+    attributes below and implement connect() and fetchBatch(); fetch() returns
+    (payload by key, fetch time by key, error message by key) for the keys found.
+    '''
+
+    name = None          # cache platform
+    stage_name = None    # metrics stage
+    title = None         # API name, for the console
+    noun = 'keys'        # what the keys are, for the console
+    batch_size = 50      # keys per API request
+    max_workers = 1      # batches in flight at once
+    rate_limit = None    # (calls, seconds), or None when the API tells us when to slow down
+    fields = ''          # field set requested, part of the cache key
+
+    def __init__(self):
+        self.limiter = RateLimiter(*self.rate_limit) if self.rate_limit else None
+
+    # drop empty and duplicate keys
+    def prepare(self, keys):
+        return list(set(filter(None, keys)))
+
+    # the API client batches are called with; only called when there is something to fetch
+    def connect(self):
+        return None
+
+    # Look up one batch of keys; returns ({key: payload, or None if the API has nothing for it}, {key: error message}
+    # for keys the API rejected, number of requests made). Call self.throttle() before each request. Both are cached,
+    # so only report errors about the key itself (e.g. an unknown alias); raise errors that would fail any key (auth,
+    # throttling, network), and nothing from the batch is cached.
+    def fetchBatch(self, client, batch):
+        raise NotImplementedError
+
+    # what to cache for a rejected key (None: cache it as not found)
+    def errorPayload(self, error):
+        return None
+
+    # add any counters the client kept (e.g. rate limit waits) to the metrics once every batch is in
+    def finish(self, client, progress):
+        pass
+
+    def throttle(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def fetch(self, keys, cache=None, executor=None):
+        keys = self.prepare(keys)
+
+        results = {}
+        fetched_at = {}
+        errors = {}
+
+        # use fresh cached results where we have them and only ask the API for the rest
+        if cache is not None:
+            cached = cache.get_many(self.name, keys, fields=self.fields)
+            for key, (payload, cached_at) in cached.items():
+                if payload is not None:
+                    results[key] = payload
+                    fetched_at[key] = cached_at
+            keys = [key for key in keys if key not in cached]
+            print('Found ' + str(len(cached)) + ' ' + self.noun + ' in the cache.')
+
+        batches = list(chunks(keys, self.batch_size))
+        if not batches:
+            return results, fetched_at, errors
+
+        client = self.connect()
+        print('Calling ' + self.title + ' for ' + str(len(keys)) + ' ' + self.noun + ' in ' + str(len(batches)) + ' chunks...')
+
+        with stage(self.stage_name, total=len(batches)) as progress:
+            for batch, (found, batch_errors, requests_made) in self.runBatches(client, batches, executor):
+                now = time.time()
+                for key, payload in found.items():
+                    if payload is not None:
+                        results[key] = payload
+                        fetched_at[key] = now
+                errors.update(batch_errors)
+                progress.progress(api_calls=requests_made, found=sum(payload is not None for payload in found.values()),
+                                  errors=len(batch_errors))
+
+                # cache each batch as it arrives (including keys the API didn't return), so a rerun after a failure skips it
+                if cache is not None:
+                    cache.set_many(self.name, dict(found, **{key: self.errorPayload(error) for key, error in batch_errors.items()}),
+                                   fields=self.fields)
+
+            if self.limiter is not None:
+                progress.count('rate_limit_wait_seconds', round(self.limiter.wait_seconds, 1))
+            self.finish(client, progress)
+
+        return results, fetched_at, errors
+
+    # Yields (batch, fetchBatch result) as batches finish, with at most max_workers of this platform's batches on the
+    # executor at a time, so platforms sharing an executor each get their share of it
+    def runBatches(self, client, batches, executor=None):
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            batches = iter(batches)
+            pending = {executor.submit(self.fetchBatch, client, batch): batch for batch in itertools.islice(batches, self.max_workers)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    yield batch, future.result()
+                    for next_batch in itertools.islice(batches, 1):
+                        pending[executor.submit(self.fetchBatch, client, next_batch)] = next_batch
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+class RateLimiter(object):
+    '''
+    Allows a number of calls per period (a token bucket that starts full and
+    refills evenly), blocking callers that would go over it.
+    '''
+
+    def __init__(self, calls, seconds):
+        self.capacity = calls
+        self.rate = calls / seconds
+        self.tokens = calls
+        self.updated = time.time()
+        self.lock = threading.Lock()
+        self.wait_seconds = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait_for = -self.tokens / self.rate if self.tokens < 0 else 0
+            self.wait_seconds += wait_for
+
+        # the token is already ours; callers that come after this one wait behind it
+        if wait_for:
+            time.sleep(wait_for)
+
+# Run each platform's fetch ({name: function of the shared executor}) at the same time, with their batches on one
+# thread pool. Returns {name: what the function returned}; if any of them fail, the others still finish (and save
+# their results) before the first error is raised.
+def fetchPlatforms(fetches, max_workers=16):
+    results = {}
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, ThreadPoolExecutor(max_workers=max(len(fetches), 1)) as platforms:
+        futures = {name: platforms.submit(fetch, executor) for name, fetch in fetches.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print('\n' + name + ' fetch failed: ' + type(e).__name__ + ': ' + str(e))
+                failures.append(e)
+
+    if failures:
+        raise failures[0]
+
+    return results
@@ -0,0 +1,90 @@
+import re
+
+import requests
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+''' HELPER FUNCTIONS '''
+
+# need this for Twitter API calls to UsersLookup
+def chunks(biglist, chunksize):
+    """Yield successive n-sized chunks from l."""
+    for i in range(0, len(biglist), chunksize):
+        yield biglist[i:i + chunksize]
+
+# shared keep-alive session that retries throttled (429) and server error (5xx) responses with exponential backoff,
+# honoring Retry-After; once retries run out requests raises instead of returning the error page
+def make_session(pool_size=10, retries=5, backoff_factor=1):
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+def check_missing_screen_name(service_key_list, service_url):
+    for service_key in service_key_list:
+        if service_key in service_url:
+            return "missing screen name (check service_url for errors)"
+    return "service_key does not match service_url"
+
+# since not all entries have usernames filled in, parse a Twitter URL for screen name and convert to lower case
+def get_username(url):
+    if 'witter.com' in url:
+        regex = r"(?:https?:\/\/)?(?:www\.)?[tT]witter\.com\/(?:#!\/)?@?([^\/\?\s]*)"
+    elif 'acebook.com' in url:
+        # thanks to @marcgg and @nkanaev on GitHub thread: https://gist.github.com/marcgg/733592
+        regex = r"(?:https?:\/\/)?(?:www\.)?[fF]acebook\.com\/(?:.+\/)*([\w\.\-]+)"
+    else:
+        return None
+
+    try:
+        username = re.search(regex, url).group(1)
+    except AttributeError:
+        return None
+
+    try:
+        return username.lower()
+    except:
+        return username
+
+def generate_url(row):
+    if row['username'] and row['service_key'] == 'twitter':
+        return 'https://www.twitter.com/' + row['username']
+    elif row['username'] and row['service_key'] == 'facebook':
+        return 'https://www.facebook.com/' + row['username']
+    else:
+        return None
+
+def getLastTweet(tweet_dict):
+    try:
+        return tweet_dict['created_at']
+    except TypeError:
+        return None
+
+def getLastFacebookPost(feed_dict):
+    try:
+        return feed_dict['data'][0]['created_time']
+    except (TypeError, IndexError):   # no feed, or a page that has never posted
+        return None
+
+def getLastYouTubeVideo(latest_upload):
+    try:
+        return latest_upload['publishedAt']
+    except TypeError:   # a channel with no uploads
+        return None
+
+def lastPostedCategory(datetime_difference):
+    if datetime_difference < pd.Timedelta('24 hours'):
+        return 'within last 24 hours'
+    elif datetime_difference < pd.Timedelta('7 days'):
+        return 'within last week'
+    elif datetime_difference < pd.Timedelta('30 days'):
+        return 'within last month'
+    elif datetime_difference < pd.Timedelta('365 days'):
+        return 'within last year'
+    else:
+        return 'more than a year ago'
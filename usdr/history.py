@@ -0,0 +1,245 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from usdr.joins import hashJoin
+from usdr.recency import datetimeValues, utcTimestamp
+from usdr.registry import loadUSDR, loadAgencyTables
+from usdr.twitter_api import loadTwitter
+from usdr.facebook_api import loadFacebook
+from usdr.youtube_api import loadYouTube
+from usdr.transform import prepareAccounts
+from usdr.storage import saveFrame, loadFrame, dataPath
+
+''' SNAPSHOT HISTORY '''
+
+# Every fetch overwrites the saved API results, so the history keeps each run's follower/fan counts and last post
+# time as well: one Parquet file per run in data/history/<platform>/, never rewritten, named after the earliest
+# last_api_call in it. A row is keyed by (account_id, last_api_call) and is only written when one of the account's
+# metrics changed since its last row (or it's new), and it holds the change rather than the value: metric minus the
+# last known value (last_posted_at as seconds since the epoch). Mostly-unchanged counts then take a few bits per row
+# on disk, and a metric the API didn't return is stored as missing and keeps its last known value.
+#
+# Values at any time are rebuilt by adding the changes up per account (a cumulative sum over columns read on their
+# own), and files newer than the end of a query aren't read at all.
+
+HISTORY_METRICS = {
+    'twitter': ['followers_count', 'friends_count', 'statuses_count', 'listed_count', 'favourites_count', 'last_posted_at'],
+    'facebook': ['fan_count', 'talking_about_count', 'checkins', 'rating_count', 'last_posted_at'],
+    'youtube': ['subscriber_count', 'view_count', 'video_count', 'last_posted_at'],
+}
+
+# stored as seconds since the epoch, and turned back into datetimes when loaded
+TIME_METRICS = ['last_posted_at']
+
+# the API results' column each registry key matches (see mergeTwitter, mergeFacebook, mergeYouTube)
+HISTORY_KEYS = {
+    'twitter': ('username', 'screen_name'),
+    'facebook': ('url_from_username', 'url'),
+    'youtube': ('service_url', 'url'),
+}
+
+SNAPSHOT_NAME = re.compile(r'^(\d{8}T\d{6})(?:-\d+)?\.parquet$')
+
+def historyName(platform, name=''):
+    return 'history/' + platform + ('/' + name if name else '')
+
+# Add a prepared platform frame's metrics (e.g. from prepareTwitter) to the history as one snapshot file, and return
+# the rows written. Accounts whose metrics haven't changed, and results no newer than the last recorded for an
+# account (e.g. answered from the API cache), add nothing.
+def recordSnapshot(platform, api_frame):
+    metrics = HISTORY_METRICS[platform]
+    values = snapshotValues(api_frame, metrics)
+    latest = latestValues(platform)
+
+    previous = latest.reindex(values['account_id'].values)
+    new = previous['last_api_call'].isnull().values
+    newer = new | (values['last_api_call'].values > previous['last_api_call'].values)
+
+    changed = new.copy()
+    deltas = {}
+    for metric in metrics:
+        current = values[metric].values
+        before = previous[metric].values
+        known = ~pd.isnull(current)
+        changed |= known & (pd.isnull(before) | (current != before))
+        deltas[metric] = pd.array(np.where(known, current - np.nan_to_num(before.astype('float64')), np.nan)).astype('Int64')
+
+    keep = changed & newer
+    snapshot = pd.DataFrame({'account_id': values['account_id'].values[keep], 'last_api_call': values['last_api_call'].values[keep]})
+    for metric in metrics:
+        snapshot[metric] = smallestInteger(deltas[metric][keep])
+
+    if len(snapshot):
+        os.makedirs(os.path.dirname(dataPath(historyName(platform, 'x'))), exist_ok=True)
+        saveFrame(snapshot, historyName(platform, snapshotName(platform, snapshot['last_api_call'].min())))
+
+    print('Recorded ' + '{:,}'.format(len(snapshot)) + ' changed ' + platform + ' accounts of ' + '{:,}'.format(len(values))
+          + ' in the history.')
+
+    return snapshot
+
+# one row per API account: its ID as text, last_api_call and metrics as floats (NaN where missing). Facebook URLs
+# whose page details weren't fetched have no last_api_call, and nothing to record.
+def snapshotValues(api_frame, metrics):
+    frame = api_frame[api_frame['id'].notnull() & api_frame['last_api_call'].notnull()]
+    values = pd.DataFrame({'account_id': accountIds(frame['id']), 'last_api_call': datetimeValues(frame['last_api_call'])})
+    for metric in metrics:
+        if metric not in frame:
+            values[metric] = np.nan
+        elif metric in TIME_METRICS:
+            values[metric] = epochSeconds(frame[metric])
+        else:
+            values[metric] = pd.to_numeric(frame[metric], errors='coerce').astype('float64').values
+
+    # Facebook pages can be found under more than one URL
+    return values.sort_values('last_api_call', kind='stable').drop_duplicates('account_id', keep='last').reset_index(drop=True)
+
+def snapshotName(platform, first_call):
+    stamp = pd.Timestamp(first_call).strftime('%Y%m%dT%H%M%S')
+    name, n = stamp, 1
+    while os.path.exists(dataPath(historyName(platform, name))):
+        name, n = stamp + '-' + str(n), n + 1
+    return name
+
+# the snapshot files of a platform as (name, time of the earliest last_api_call in it), oldest first
+def snapshotFiles(platform):
+    directory = os.path.dirname(dataPath(historyName(platform, 'x')))
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for filename in os.listdir(directory):
+        match = SNAPSHOT_NAME.match(filename)
+        if match:
+            files.append((filename[:-len('.parquet')], pd.Timestamp(match.group(1))))
+    return sorted(files, key=lambda f: (f[1], len(f[0]), f[0]))
+
+# The recorded values for each account, one row per change (account_id, last_api_call and the metrics, or only
+# the given ones), from start to end. Values are rebuilt from every change up to end, so start only trims rows.
+def loadHistory(platform, start=None, end=None, metrics=None):
+    metrics = HISTORY_METRICS[platform] if metrics is None else list(metrics)
+    end = utcTimestamp(end) if end is not None else None
+
+    files = [name for name, first_call in snapshotFiles(platform) if end is None or first_call <= end]
+    columns = ['account_id', 'last_api_call'] + metrics
+    if not files:
+        return pd.DataFrame({column: pd.Series(dtype='float64') for column in columns})
+
+    changes = pd.concat([loadFrame(historyName(platform, name), columns=columns) for name in files], ignore_index=True)
+    changes['last_api_call'] = datetimeValues(changes['last_api_call'])
+    if end is not None:
+        changes = changes[changes['last_api_call'].values <= end.to_datetime64()]
+    changes = changes.sort_values(['account_id', 'last_api_call'], kind='stable').reset_index(drop=True)
+
+    history = changes[['account_id', 'last_api_call']].copy()
+    accounts = changes['account_id']
+    for metric in metrics:
+        deltas = changes[metric].astype('Float64')
+        values = deltas.fillna(0).groupby(accounts.values).cumsum()
+        seen = deltas.notnull().groupby(accounts.values).cumsum() > 0
+        values = values.where(seen).astype('Int64')
+        history[metric] = pd.to_datetime(values.astype('float64'), unit='s') if metric in TIME_METRICS else values
+
+    if start is not None:
+        history = history[history['last_api_call'].values >= utcTimestamp(start).to_datetime64()].reset_index(drop=True)
+
+    return history
+
+# each account's values as of a time (or the latest), indexed by account_id
+def valuesAt(platform, when=None, metrics=None):
+    history = loadHistory(platform, end=when, metrics=metrics)
+    return history.drop_duplicates('account_id', keep='last').set_index('account_id')
+
+# latest recorded values as floats (seconds for times), to compare new results with
+def latestValues(platform):
+    latest = valuesAt(platform)
+    latest['last_api_call'] = datetimeValues(latest['last_api_call'])
+    for metric in HISTORY_METRICS[platform]:
+        latest[metric] = epochSeconds(latest[metric]) if metric in TIME_METRICS else latest[metric].astype('float64')
+    return latest
+
+# Change in a metric per account between start and end (default: now): its value at each, and the growth.
+# Accounts without a value at start (e.g. first recorded after it) have no growth.
+def accountGrowth(platform, metric, start, end=None):
+    end = pd.Timestamp.now('UTC') if end is None else end
+    before = valuesAt(platform, start, metrics=[metric])[metric]
+    after = valuesAt(platform, end, metrics=[metric])[metric]
+
+    growth = pd.DataFrame({'start': before.reindex(after.index), 'end': after})
+    growth['growth'] = growth['end'] - growth['start']
+    growth.index.name = 'account_id'
+
+    return growth
+
+# Total growth in a metric per agency over the last days before end: accounts, totals at start and end, growth and
+# growth as a share of the start total. Accounts are linked to agencies through the registry records they match
+# (accts and api_frame default to the saved ones), and an account listed twice under one agency counts once.
+def agencyGrowth(platform, metric='followers_count', days=90, end=None, accts=None, api_frame=None):
+    end = pd.Timestamp.now('UTC') if end is None else end
+    growth = accountGrowth(platform, metric, utcTimestamp(end) - pd.Timedelta(days=days), end).dropna(subset=['growth'])
+
+    links = accountAgencies(platform, accts, api_frame)
+    joined = pd.merge(links, growth.reset_index(), on='account_id').drop_duplicates(['agency_id', 'account_id'])
+
+    totals = joined.groupby('agency_id').agg(accounts=('account_id', 'size'), start=('start', 'sum'), end=('end', 'sum'),
+                                             growth=('growth', 'sum'))
+    totals['growth_rate'] = totals['growth'] / totals['start'].where(totals['start'] != 0)
+
+    account_agencies, agencies = loadAgencyTables()
+    totals.insert(0, 'agency_name', agencies['name'].reindex(totals.index).values)
+
+    return totals.sort_values('growth', ascending=False)
+
+# (account_id, agency_id) for a platform's API accounts, by joining them to the registry records they were fetched for
+def accountAgencies(platform, accts=None, api_frame=None):
+    registry_key, api_key = HISTORY_KEYS[platform]
+    if accts is None:
+        accts = prepareAccounts(loadUSDR(columns=['id', 'service_key', 'service_url', 'created_at', 'updated_at']))
+    if api_frame is None:
+        api_frame = loadPlatformKeys(platform, api_key)
+
+    accts = accts.loc[accts['service_key'] == platform, ['id', registry_key]].rename(columns={'id': 'usdr_id'})
+    api_frame = api_frame.loc[api_frame['id'].notnull(), ['id', api_key]]
+    api_frame = api_frame.assign(id=accountIds(api_frame['id']))
+    if platform == 'twitter':
+        api_frame = api_frame.assign(screen_name=api_frame['screen_name'].str.lower())
+
+    matched = hashJoin(accts.dropna(subset=[registry_key]), api_frame, registry_key, api_key).dropna(subset=['usdr_id', 'id'])
+    matched = pd.DataFrame({'usdr_id': matched['usdr_id'].astype('int64').values, 'account_id': matched['id'].values})
+
+    account_agencies, agencies = loadAgencyTables()
+    links = account_agencies.reset_index().rename(columns={'account_id': 'usdr_id'})
+
+    return pd.merge(matched, links, on='usdr_id')[['account_id', 'agency_id']]
+
+def loadPlatformKeys(platform, api_key):
+    loader = {'twitter': loadTwitter, 'facebook': loadFacebook, 'youtube': loadYouTube}[platform]
+    return loader(columns=['id', api_key])
+
+# Account IDs as text: Twitter's are integers, Facebook's numeric strings and YouTube's channel IDs. They're turned
+# into text before any join, since an integer column with gaps becomes float and Twitter IDs would lose digits.
+def accountIds(ids):
+    ids = pd.Series(ids).reset_index(drop=True)
+    if pd.api.types.is_float_dtype(ids):
+        ids = ids.astype('Int64')
+    return ids.astype(str).values.astype(object)
+
+# seconds since the epoch (NaN where missing) for datetimes or time strings
+def epochSeconds(values):
+    times = datetimeValues(values)
+    seconds = times.astype('datetime64[s]').astype('int64').astype('float64')
+    return np.where(np.isnat(times), np.nan, seconds)
+
+# the smallest nullable integer type that holds every change
+def smallestInteger(values):
+    values = pd.array(values, dtype='Int64')
+    if values.isna().all():
+        return values.astype('Int8')
+    low, high = values.min(), values.max()
+    for dtype in ['Int8', 'Int16', 'Int32']:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
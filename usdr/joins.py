@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from usdr.storage import dataPath, saveFrame, loadFrame, frameColumns
+
+''' INDEXED JOINS '''
+
+# Registry accounts are joined to API results on string keys (username/screen_name, URL, Facebook ID). Instead of
+# pd.merge(..., sort=True), which compares the strings and sorts the result on every run, the keys are turned into
+# integer codes with a KeyIndex and the rows are paired up by code, in the order they come. Rows whose key is missing
+# never match, so they come out unmatched (pd.merge would pair up missing keys with each other).
+#
+# Pairing rows by code is cheap next to reading or writing a saved join (which is mostly encoding and decoding the
+# nested JSON columns), so an IndexedJoin always pairs up the rows it's given, and uses its saved key index to tell
+# whether anything changed and the saved join needs to be written again.
+
+class KeyIndex(object):
+    '''
+    Stable integer code for each join key: a key's code is the position it was
+    first seen in, and new keys are added at the end, so codes don't change
+    from one run to the next. Missing keys get -1.
+    '''
+
+    def __init__(self, keys=()):
+        self.keys = pd.Index(keys, dtype=object)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def encode(self, values):
+        values = np.asarray(values, dtype=object)
+        codes = self.keys.get_indexer(values)
+
+        new = (codes == -1) & pd.notnull(values)
+        if new.any():
+            self.keys = self.keys.append(pd.Index(pd.unique(values[new]), dtype=object))
+            codes[new] = self.keys.get_indexer(values[new])
+
+        return codes
+
+    # codes of keys already in the index, without adding the others
+    def lookup(self, values):
+        return self.keys.get_indexer(np.asarray(values, dtype=object))
+
+# Positions of the left and right rows that make up each row of an outer join on integer codes (-1 where a side has
+# no row): each left row with every right row that has its code, in left order, then the right rows nothing matched.
+# Right rows are grouped by code with a stable argsort of the codes, so a code's matches are one slice.
+def joinPositions(left_codes, right_codes, size):
+    valid = np.flatnonzero(right_codes >= 0)
+    order = valid[np.argsort(right_codes[valid], kind='stable')]
+    counts = np.bincount(right_codes[valid], minlength=size)
+    starts = np.cumsum(counts) - counts
+
+    matched = left_codes >= 0
+    matches = np.zeros(len(left_codes), dtype='int64')
+    matches[matched] = counts[left_codes[matched]]
+
+    repeats = np.maximum(matches, 1)
+    left_positions = np.repeat(np.arange(len(left_codes)), repeats)
+    offsets = np.arange(len(left_positions)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    codes = np.repeat(left_codes, repeats)
+    right_positions = np.full(len(left_positions), -1, dtype='int64')
+    has_match = np.repeat(matches > 0, repeats)
+    right_positions[has_match] = order[starts[codes[has_match]] + offsets[has_match]]
+
+    used = np.zeros(size, dtype=bool)
+    used[left_codes[matched]] = True
+    right_only = np.flatnonzero((right_codes < 0) | ~used[np.maximum(right_codes, 0)])
+
+    return (np.concatenate([left_positions, np.full(len(right_only), -1, dtype='int64')]),
+            np.concatenate([right_positions, right_only]))
+
+# column names each side gets in the joined frame, with suffixes on the columns both sides have (one key column when
+# left_on and right_on are the same name, like pd.merge(on=...))
+def joinColumns(left_columns, right_columns, left_on, right_on, suffixes=('_x', '_y')):
+    shared = set(left_columns) & set(right_columns)
+    if left_on == right_on:
+        shared.discard(left_on)
+    left_names = {c: c + suffixes[0] if c in shared else c for c in left_columns}
+    right_names = {c: c + suffixes[1] if c in shared else c for c in right_columns if not (c == right_on == left_on)}
+    return left_names, right_names
+
+# Outer join of two frames by key code, keeping both frames' columns (suffixed where they clash). Integer columns
+# with missing rows become floats, as with pd.merge.
+def hashJoin(left, right, left_on, right_on=None, suffixes=('_x', '_y'), keys=None):
+    right_on = left_on if right_on is None else right_on
+    keys = KeyIndex() if keys is None else keys
+    left_codes = keys.encode(left[left_on])
+    right_codes = keys.encode(right[right_on])
+    return joinCodes(left, right, left_codes, right_codes, len(keys), left_on, right_on, suffixes)
+
+def joinCodes(left, right, left_codes, right_codes, size, left_on, right_on, suffixes):
+    left_positions, right_positions = joinPositions(left_codes, right_codes, size)
+    left_names, right_names = joinColumns(left.columns, right.columns, left_on, right_on, suffixes)
+
+    # reindexing by position gives an all-missing row for -1
+    joined_left = left.reset_index(drop=True).reindex(left_positions).rename(columns=left_names)
+    joined_right = right[list(right_names)].reset_index(drop=True).reindex(right_positions).rename(columns=right_names)
+    joined = pd.concat([joined_left.reset_index(drop=True), joined_right.reset_index(drop=True)], axis=1)
+
+    if left_on == right_on:
+        # the shared key column comes from whichever side has the row
+        right_keys = right[right_on].reset_index(drop=True).reindex(right_positions).values
+        joined[left_on] = joined[left_on].where(joined[left_on].notnull(), right_keys)
+
+    return joined
+
+class IndexedJoin(object):
+    '''
+    Outer join saved as data/<name>.parquet, with its key index and a hash of
+    each key's rows on either side saved in data/<name>_keys.parquet. Key codes
+    stay the same from one join to the next, and a join in which no key's rows
+    changed isn't written out again. Only the version columns are hashed (by
+    default every column); a row counts as changed when one of them does.
+    '''
+
+    def __init__(self, name, left_on, right_on, suffixes=('_x', '_y'), left_version=None, right_version=None):
+        self.name = name
+        self.left_on = left_on
+        self.right_on = right_on
+        self.suffixes = suffixes
+        self.left_version = left_version
+        self.right_version = right_version
+
+    def join(self, left, right, incremental=True):
+        saved = self.loadKeys() if incremental else None
+        keys = KeyIndex(saved['key'].values[:-1] if saved is not None else ())
+
+        left_codes = keys.encode(left[self.left_on])
+        right_codes = keys.encode(right[self.right_on])
+        joined = joinCodes(left, right, left_codes, right_codes, len(keys), self.left_on, self.right_on, self.suffixes)
+
+        # the last row holds the hashes of the rows without a key
+        hashes = pd.DataFrame({
+            'key': np.append(keys.keys.values, None),
+            'left_hash': keyHashes(left, left_codes, len(keys), self.left_version),
+            'right_hash': keyHashes(right, right_codes, len(keys), self.right_version),
+        })
+
+        changed = changedKeys(saved, hashes)
+        if saved is None or changed or frameColumns(self.name) != list(joined.columns):
+            saveFrame(joined, self.name)
+            saveFrame(hashes, self.name + '_keys')
+        if saved is not None:
+            print(self.name + ': ' + '{:,}'.format(changed) + ' of ' + '{:,}'.format(len(keys)) + ' keys changed since the last merge.')
+
+        return joined
+
+    def loadKeys(self):
+        if not os.path.exists(dataPath(self.name + '_keys')) or not os.path.exists(dataPath(self.name)):
+            return None
+        return loadFrame(self.name + '_keys')
+
+# Sum of the row hashes for each key code (wrapping around), which changes if any of a key's rows do, with the rows
+# that have no key summed in an extra slot at the end. Nested values are hashed as text.
+def keyHashes(df, codes, size, columns=None):
+    df = df[[c for c in columns if c in df]] if columns is not None else df
+    row_hashes = pd.util.hash_pandas_object(df.astype({c: str for c in df.columns[df.dtypes == object]}), index=False).values
+
+    hashes = np.zeros(size + 1, dtype='uint64')
+    np.add.at(hashes, np.where(codes >= 0, codes, size), row_hashes)
+    return hashes
+
+# number of keys (counting the rows without one as a key) whose rows on either side differ from the saved hashes
+def changedKeys(saved, hashes):
+    if saved is None:
+        return len(hashes)
+
+    changed = np.zeros(len(hashes), dtype=bool)
+    for column in ['left_hash', 'right_hash']:
+        # keys added since come before the slot for rows without a key, and had no rows before
+        old = np.zeros(len(hashes), dtype='uint64')
+        old[:len(saved) - 1] = saved[column].values[:-1]
+        old[-1] = saved[column].values[-1]
+        changed |= old != hashes[column].values
+    return int(np.count_nonzero(changed))
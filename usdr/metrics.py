@@ -0,0 +1,149 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+''' INSTRUMENTATION '''
+
+# Each stage (fetchUSDR, fetchTwitter, fetchFacebookURLs, ..., and each pipeline stage) is timed with
+# `with stage(name, total) as s:`, calling s.progress() as work gets done and s.count() for things like API calls,
+# retries and time spent waiting on rate limits. Progress and an ETA are shown on one console line while the stage
+# runs, and once recordMetrics(path) has been called every start, progress and end event is also appended to that
+# file as a line of JSON, with the stage's counters and the process's memory use. One run of the pipeline shares a
+# run ID, so `grep` or pandas.read_json(path, lines=True) shows which stage slowed down and why.
+
+METRICS_PATH = None
+METRICS_FILE = None
+RUN_ID = uuid.uuid4().hex[:12]
+LOCK = threading.Lock()
+
+# Start appending metrics to path (None to stop); events from here on get a new run ID. The file stays open until
+# metrics go somewhere else or the process exits, and is flushed at the start and end of each stage, not after every
+# progress event.
+def recordMetrics(path):
+    global METRICS_PATH, METRICS_FILE, RUN_ID
+    if path and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with LOCK:
+        if METRICS_FILE is not None:
+            METRICS_FILE.close()
+        METRICS_FILE = open(path, 'a') if path else None
+        METRICS_PATH = path or None
+        RUN_ID = uuid.uuid4().hex[:12]
+
+def emit(record):
+    if METRICS_FILE is None:
+        return
+    record = dict({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'run': RUN_ID}, **record)
+    with LOCK:
+        if METRICS_FILE is None:
+            return
+        METRICS_FILE.write(json.dumps(record, default=str) + '\n')
+        if record.get('event') != 'progress':
+            METRICS_FILE.flush()
+
+atexit.register(recordMetrics, None)
+
+class Stage(object):
+    '''
+    Timer, progress display and counters for one stage; use through stage().
+    progress() and count() may be called from several threads at once.
+    '''
+
+    def __init__(self, name, total=None, unit='chunks'):
+        self.name = name
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.shown = False
+
+    def __enter__(self):
+        self.start = time.time()
+        emit({'stage': self.name, 'event': 'start', 'total': self.total, 'unit': self.unit, 'rss_mb': memoryUsage()[0]})
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.time() - self.start
+        if self.shown:
+            print('\r' + self.statusLine() + '    ')
+        rss, peak = memoryUsage()
+        record = {'stage': self.name, 'event': 'error' if exc_type else 'end', 'seconds': round(elapsed, 3), 'done': self.done,
+                  'total': self.total, 'unit': self.unit, 'counts': self.counts, 'rss_mb': rss, 'peak_rss_mb': peak}
+        if exc_type:
+            record['error'] = exc_type.__name__ + ': ' + str(exc)
+        emit(record)
+        return False
+
+    # advance by some amount of work (or set how much is done), adding any counts that go with it
+    def progress(self, advance=1, done=None, **counts):
+        with self.lock:
+            self.done = done if done is not None else self.done + advance
+            for name, value in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+            line = self.statusLine()
+            elapsed, eta = self.timing()
+
+        print('\r' + line + '    ', end='')
+        sys.stdout.flush()
+        self.shown = True
+        emit({'stage': self.name, 'event': 'progress', 'done': self.done, 'total': self.total, 'unit': self.unit,
+              'seconds': round(elapsed, 3), 'eta_seconds': round(eta, 1) if eta is not None else None})
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def timing(self):
+        elapsed = time.time() - self.start
+        eta = elapsed / self.done * (self.total - self.done) if self.total and self.done else None
+        return elapsed, eta
+
+    def statusLine(self):
+        elapsed, eta = self.timing()
+        line = self.name + ': ' + '{:,}'.format(self.done)
+        if self.total:
+            line += ' of {:,} {} ({:.0%})'.format(self.total, self.unit, self.done / self.total)
+        else:
+            line += ' ' + self.unit
+        line += ', ' + formatSeconds(elapsed)
+        if eta is not None and self.done < self.total:
+            line += ', about ' + formatSeconds(eta) + ' left'
+        return line
+
+def stage(name, total=None, unit='chunks'):
+    return Stage(name, total, unit)
+
+def formatSeconds(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02}:{:02}'.format(hours, minutes, seconds) if hours else '{}:{:02}'.format(minutes, seconds)
+
+# (current, peak) resident memory of this process in MB, where the OS tells us
+def memoryUsage():
+    current = None
+    peak = None
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            current = round(int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        peak = max(round(peak, 1), current or 0)
+    return current, peak
+
+# number of times urllib3 retried the request behind a requests response (throttling, server errors)
+def retryCount(response):
+    retries = getattr(response.raw, 'retries', None)
+    return len(getattr(retries, 'history', ()) or ())
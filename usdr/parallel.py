@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+''' PARTITIONED EXECUTION '''
+
+# The per-row Python work in the offline steps (decoding JSON columns when loading, parsing usernames and dates out
+# of the registry, pulling the last post out of each Twitter status or Facebook feed) runs on one core. Once
+# useProcesses(workers, chunk_size) has been called, those steps split their rows into chunks of chunk_size and run
+# the chunks on a pool of worker processes. The chunks are contiguous and their results are put back together in
+# order, so the output is the same as running on one core whatever the number of workers. Frames no bigger than one
+# chunk are still done in this process, since starting workers and copying rows to them would cost more.
+#
+# Workers are started from a clean process (forkserver, or spawn where there's no forkserver) rather than forked from
+# this one: the fetch stage runs these steps on its platform threads while other threads hold locks (the API cache,
+# metrics, stdout), and a forked child would inherit those locks held with no thread to release them. Scripts using
+# processes need the usual `if __name__ == '__main__':` guard.
+
+WORKERS = 1
+CHUNK_SIZE = 100000
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# run partitioned steps on this many processes (None for one per core, 1 to turn it off), chunk_size rows at a time
+def useProcesses(workers=None, chunk_size=CHUNK_SIZE):
+    global WORKERS, CHUNK_SIZE
+    WORKERS = (os.cpu_count() or 1) if workers is None else max(int(workers), 1)
+    CHUNK_SIZE = max(int(chunk_size), 1)
+
+# func(part, *args) for each chunk of rows of df (a frame, series or array), with the results (frames, series or
+# arrays) concatenated in row order. func has to be a module-level function, so the workers can import it.
+def mapPartitions(func, df, *args):
+    if WORKERS <= 1 or len(df) <= CHUNK_SIZE:
+        return func(df, *args)
+
+    parts = [df[start:start + CHUNK_SIZE] for start in range(0, len(df), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=min(WORKERS, len(parts)), mp_context=multiprocessing.get_context(START_METHOD)) as executor:
+        results = list(executor.map(func, parts, *[[arg] * len(parts) for arg in args]))
+
+    if isinstance(results[0], (pd.DataFrame, pd.Series)):
+        return pd.concat(results)
+    return np.concatenate(results)
@@ -0,0 +1,211 @@
+import os
+
+import pandas as pd
+
+from usdr.registry import fetchUSDR, syncUSDR, streamUSDR, loadUSDR, saveUSDR
+from usdr.twitter_api import fetchTwitter, loadTwitter
+from usdr.facebook_api import fetchFacebook, loadFacebook
+from usdr.youtube_api import fetchYouTube, loadYouTube, youtubeConfigured
+from usdr.fetchers import fetchPlatforms
+from usdr.transform import prepareAccounts, prepareTwitter, prepareFacebook, prepareYouTube, mergeTwitter, mergeFacebook, mergeYouTube, loadMerged
+from usdr.report import summarizeReport, formatReport, saveReport
+from usdr.cube import buildCube, loadCube
+from usdr.dedup import findDuplicates
+from usdr.history import recordSnapshot
+from usdr.cache import APICache
+from usdr.metrics import recordMetrics, Stage
+from usdr.parallel import useProcesses
+from usdr.storage import loadFrame, dataPath, convertJSONResults
+from usdr.schema import applySchema, USDR_DTYPES
+
+''' PIPELINE '''
+
+# stages in the order they run when none are named
+STAGES = ['registry', 'dedup', 'fetch', 'merge', 'aggregate', 'report']
+
+# the fetch stage runs these at the same time; each can also be run on its own
+PLATFORM_STAGES = ['twitter', 'facebook', 'youtube']
+
+class Pipeline(object):
+    '''
+    Runs the named stages on demand, e.g. Pipeline().run('twitter', 'merge').
+    Fetch stages call the APIs; any input a stage needs that wasn't produced
+    earlier in the same pipeline is loaded from the saved files in data/ instead.
+    '''
+
+    def __init__(self, usdr_workers=8, usdr_sync=False, usdr_stream=False, use_cache=True, resolve_redirects=True, metrics_path=None,
+                 report_format='text', report_output=None, fetch_workers=16, record_history=True,
+                 workers=1, chunk_size=100000):
+        self.usdr_workers = usdr_workers
+        self.usdr_sync = usdr_sync
+        self.usdr_stream = usdr_stream
+        self.use_cache = use_cache
+        self.resolve_redirects = resolve_redirects
+        self.metrics_path = metrics_path
+        self.report_format = report_format
+        self.report_output = report_output
+        self.fetch_workers = fetch_workers
+        self.record_history = record_history
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache = None
+
+        self.accts = None
+        self.twitter_api = None
+        self.facebook_api = None
+        self.youtube_api = None
+        self.twitter_merged = None
+        self.facebook_merged = None
+        self.youtube_merged = None
+        self.cube = None
+        self.duplicates = None
+
+    def run(self, *stages):
+        stages = list(stages) or STAGES
+        for stage in stages:
+            if stage not in STAGES + PLATFORM_STAGES:
+                raise ValueError('Unknown stage "' + str(stage) + '"; choose from: ' + ', '.join(STAGES + PLATFORM_STAGES))
+
+        # each stage's timing and memory (and the fetches' API calls, retries and rate limit waits) go to metrics_path
+        if self.metrics_path:
+            recordMetrics(self.metrics_path)
+
+        # loading, parsing and deriving columns split big frames between this many processes
+        useProcesses(self.workers, self.chunk_size)
+
+        # results saved as data/*.json by older versions are converted to Parquet the first time
+        convertJSONResults()
+
+        # turn off 'SettingWithCopyWarning' error message in pandas while the stages run
+        with pd.option_context('mode.chained_assignment', None):
+            for stage in stages:
+                with Stage(stage, unit='stage'):
+                    getattr(self, 'run_' + stage)()
+
+        return self
+
+    # each stage is a run_<name> method
+
+    def run_registry(self):
+        if self.usdr_sync:
+            self.accts = prepareAccounts(syncUSDR())
+        elif self.usdr_stream:
+            streamUSDR(max_workers=self.usdr_workers)
+            # Streaming only bounds memory during the download: the later stages need the whole registry in one frame,
+            # so it's read back whole. It's saved as the API returned it, like fetchUSDR does, so syncUSDR can compare
+            # timestamps with the API's.
+            accts = pd.concat(loadUSDR(chunksize=10000, dtypes=None), ignore_index=True)
+            saveUSDR(accts)
+            self.accts = prepareAccounts(applySchema(accts, USDR_DTYPES))
+        else:
+            self.accts = prepareAccounts(fetchUSDR(max_workers=self.usdr_workers))
+
+    # cluster ID per registry record, grouping records that are the same account (saved as USDR_duplicates)
+    def run_dedup(self):
+        self.duplicates = findDuplicates(self.getAccounts())
+
+    # Every platform's lookups at once, with their batches on one pool of fetch_workers threads (YouTube only if
+    # settings.py has a key for it). A platform that fails doesn't stop the others; its error is raised at the end.
+    def run_fetch(self):
+        # loaded up front so the platform threads don't race to load them
+        self.getAccounts()
+        self.getCache()
+
+        platforms = [p for p in PLATFORM_STAGES if p != 'youtube' or youtubeConfigured()]
+        fetchPlatforms({p: self.platformFetch(p) for p in platforms}, max_workers=self.fetch_workers)
+
+    def platformFetch(self, platform):
+        def fetch(executor):
+            with Stage(platform, unit='stage'):
+                getattr(self, 'run_' + platform)(executor)
+        return fetch
+
+    # the platform stages take the fetch stage's shared thread pool, or use their own when run by themselves, and add
+    # their counts to the snapshot history unless record_history is off
+
+    def run_twitter(self, executor=None):
+        twitter_usernames = self.platformAccounts('twitter')['username'].tolist()
+        self.twitter_api = prepareTwitter(fetchTwitter(twitter_usernames, cache=self.getCache(), executor=executor))
+        self.recordHistory('twitter', self.twitter_api)
+
+    def run_facebook(self, executor=None):
+        facebook_urls = self.platformAccounts('facebook')['url_from_username'].tolist()
+        self.facebook_api = prepareFacebook(fetchFacebook(facebook_urls, cache=self.getCache(), resolve_redirects=self.resolve_redirects,
+                                                          executor=executor))
+        self.recordHistory('facebook', self.facebook_api)
+
+    def run_youtube(self, executor=None):
+        youtube_urls = self.platformAccounts('youtube')['service_url'].tolist()
+        self.youtube_api = prepareYouTube(fetchYouTube(youtube_urls, cache=self.getCache(), executor=executor))
+        self.recordHistory('youtube', self.youtube_api)
+
+    def recordHistory(self, platform, api_frame):
+        if self.record_history:
+            recordSnapshot(platform, api_frame)
+
+    # YouTube is merged once it has been fetched
+    def run_merge(self):
+        self.twitter_merged = mergeTwitter(self.platformAccounts('twitter'), self.getTwitter())
+        self.facebook_merged = mergeFacebook(self.platformAccounts('facebook'), self.getFacebook())
+        if self.getYouTube() is not None:
+            self.youtube_merged = mergeYouTube(self.platformAccounts('youtube'), self.getYouTube())
+
+    def run_aggregate(self):
+        self.cube = buildCube(*self.getMerged(), **self.getOtherMerged())
+
+    # printed, or written to report_output, as text, json, csv or html
+    def run_report(self):
+        if self.report_output:
+            saveReport(self.getCube(), self.report_output, self.report_format)
+            print('Saved ' + self.report_format + ' report to ' + self.report_output)
+        else:
+            print(formatReport(summarizeReport(self.getCube()), self.report_format), end='')
+
+    # inputs are loaded from data/ when an earlier stage didn't produce them
+
+    def getCache(self):
+        if self.use_cache and self.cache is None:
+            self.cache = APICache()
+        return self.cache
+
+    def getAccounts(self):
+        if self.accts is None:
+            self.accts = prepareAccounts(loadUSDR())
+        return self.accts
+
+    def platformAccounts(self, service_key):
+        accts = self.getAccounts()
+        return accts[accts['service_key'] == service_key]
+
+    def getTwitter(self):
+        if self.twitter_api is None:
+            self.twitter_api = prepareTwitter(loadTwitter())
+        return self.twitter_api
+
+    def getFacebook(self):
+        if self.facebook_api is None:
+            self.facebook_api = prepareFacebook(loadFacebook())
+        return self.facebook_api
+
+    # None if YouTube has never been fetched
+    def getYouTube(self):
+        if self.youtube_api is None and os.path.exists(dataPath('YouTube_API_Results')):
+            self.youtube_api = prepareYouTube(loadYouTube())
+        return self.youtube_api
+
+    def getMerged(self):
+        if self.twitter_merged is None or self.facebook_merged is None:
+            self.twitter_merged, self.facebook_merged = loadMerged()
+        return self.twitter_merged, self.facebook_merged
+
+    # {platform: merged frame} for the platforms besides Twitter and Facebook that have been merged
+    def getOtherMerged(self):
+        if self.youtube_merged is None and os.path.exists(dataPath('youtube_merged')):
+            self.youtube_merged = loadFrame('youtube_merged')
+        return {'youtube': self.youtube_merged} if self.youtube_merged is not None else {}
+
+    # the cube is rebuilt if this pipeline merged new results, so the report never reads a stale one
+    def getCube(self):
+        if self.cube is None:
+            self.cube = buildCube(*self.getMerged(), **self.getOtherMerged()) if self.twitter_merged is not None else loadCube()
+        return self.cube
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+''' LAST POSTED CATEGORIES '''
+
+# (age limit, label): a post younger than the limit goes in that bucket; limits must be in increasing order
+RECENCY_BINS = [
+    ('24 hours', 'within last 24 hours'),
+    ('7 days', 'within last week'),
+    ('30 days', 'within last month'),
+    ('365 days', 'within last year'),
+]
+OLDEST_LABEL = 'more than a year ago'
+NEVER_LABEL = 'never posted'
+
+def recencyLabels(bins=RECENCY_BINS, oldest=OLDEST_LABEL, never=NEVER_LABEL):
+    return [label for limit, label in bins] + [oldest, never]
+
+# Whole-column version of lastPostedCategory. reference_time is when we looked (a timestamp, or a column like
+# last_api_call); accounts that have never posted (NaT) get their own category instead of "more than a year ago".
+# Rows we never looked at (no reference time, e.g. Facebook URLs whose page details weren't fetched) get no category.
+def lastPostedCategories(posted_at, reference_time, bins=RECENCY_BINS, oldest=OLDEST_LABEL, never=NEVER_LABEL):
+    posted = datetimeValues(posted_at)
+    reference = datetimeValues(reference_time) if np.ndim(reference_time) else np.datetime64(utcTimestamp(reference_time), 'ns')
+
+    codes = bucketCodes(reference - posted, np.isnat(posted), bins, np.broadcast_to(np.isnat(reference), posted.shape))
+
+    return pd.Series(pd.Categorical.from_codes(codes, recencyLabels(bins, oldest, never)), index=getattr(posted_at, 'index', None))
+
+# Buckets for several reference times (e.g. last_api_call from several snapshots) at once: one column per reference
+# time, computed in a single broadcast over accounts x reference times.
+def lastPostedCategoriesAt(posted_at, reference_times, bins=RECENCY_BINS, oldest=OLDEST_LABEL, never=NEVER_LABEL):
+    posted = datetimeValues(posted_at)
+    references = np.array([utcTimestamp(t).to_datetime64() for t in reference_times], dtype='datetime64[ns]')
+
+    ages = references[np.newaxis, :] - posted[:, np.newaxis]
+    never_posted = np.broadcast_to(np.isnat(posted)[:, np.newaxis], ages.shape)
+    unknown = np.broadcast_to(np.isnat(references)[np.newaxis, :], ages.shape)
+    codes = bucketCodes(ages, never_posted, bins, unknown)
+
+    labels = recencyLabels(bins, oldest, never)
+    return pd.DataFrame({t: pd.Categorical.from_codes(codes[:, i], labels) for i, t in enumerate(reference_times)},
+                        index=getattr(posted_at, 'index', None), columns=list(reference_times))
+
+# category codes, with -1 (missing) where unknown is set
+def bucketCodes(ages, never_posted, bins, unknown=None):
+    limits = np.array([pd.Timedelta(limit).value for limit, label in bins], dtype='int64')
+
+    # side='right' so an age equal to a limit falls in the next bucket, like the < comparisons in lastPostedCategory
+    codes = np.searchsorted(limits, ages.astype('int64'), side='right')
+    codes[never_posted] = len(bins) + 1
+    if unknown is not None:
+        codes[unknown] = -1
+
+    return codes
+
+# Post times from the APIs are UTC strings with an offset (tz-aware once parsed by newer pandas) and last_api_call is
+# naive UTC, so subtracting one from the other fails or silently mixes zones. Compare everything as naive UTC.
+def datetimeValues(values):
+    values = pd.to_datetime(pd.Series(values), utc=True).dt.tz_localize(None)
+    return values.values.astype('datetime64[ns]')
+
+def utcTimestamp(value):
+    value = pd.Timestamp(value)
+    if value.tz is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    return value
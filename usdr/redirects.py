@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from usdr.helpers import make_session, get_username
+from usdr.metrics import stage
+
+''' REDIRECT RESOLVER '''
+
+# Pages that get renamed or merged keep redirecting from their old URL, so a URL the Graph API can't find may still
+# lead somewhere it can. We follow each redirect chain hop by hop (HEAD, or GET where HEAD isn't allowed), at most
+# per_host requests at a time to any one host, and cache the chains so later runs don't request them again.
+
+class HostLimiter(object):
+    '''Caps the number of requests in flight to each host.'''
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def __call__(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self.semaphores[host]
+
+# Returns {url: final URL} for the given URLs, None where the URL couldn't be reached. The chain of URLs visited is
+# cached per starting URL (platform 'redirect') until it goes stale, and so are URLs that are definitely dead (a 4xx
+# response or a malformed URL, cached as None). Timeouts, connection errors, 5xx responses and redirect loops may
+# not happen next time, so they aren't cached and the URL is checked again on the next run.
+def resolveRedirects(url_list, cache=None, max_workers=16, per_host=4, timeout=10, max_redirects=10):
+    url_list = list(set(filter(None, url_list)))
+    resolved = {}
+
+    if cache is not None:
+        cached = cache.get_many('redirect', url_list)
+        resolved.update((url, chain[-1] if chain else None) for url, (chain, cached_at) in cached.items())
+        url_list = [url for url in url_list if url not in cached]
+        print('Found ' + str(len(cached)) + ' redirect chains in the cache.')
+
+    print('Checking redirects for ' + str(len(url_list)) + ' URLs...')
+
+    limiter = HostLimiter(per_host)
+
+    def resolve(url):
+        chain, definite = resolveRedirectChain(session, limiter, url, timeout, max_redirects)
+        progress.progress(unreachable=int(chain is None))
+        return chain, definite
+
+    with make_session(pool_size=max_workers, retries=2, backoff_factor=0.5) as session, \
+            stage('resolveRedirects', total=len(url_list), unit='URLs') as progress:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(resolve, url_list))
+
+    if cache is not None:
+        cache.set_many('redirect', {url: chain for url, (chain, definite) in zip(url_list, results) if definite})
+
+    resolved.update((url, chain[-1] if chain else None) for url, (chain, definite) in zip(url_list, results))
+
+    return resolved
+
+# Registry URLs are sometimes missing the scheme or spelled Facebook.com; like the old serial loop, if the URL as
+# given can't be reached we retry with http:// added and then as a plain www.facebook.com URL for its username.
+# Returns (chain, or None if no candidate could be reached; whether that's definite enough to cache).
+def resolveRedirectChain(session, limiter, url, timeout=10, max_redirects=10):
+    candidates = [url]
+    if '://' not in url:
+        candidates.append('http://' + url)
+    username = get_username(candidates[-1]) if 'facebook.com' not in url else None
+    if username:
+        candidates.append('https://www.facebook.com/' + username)
+
+    definite = True
+    for candidate in candidates:
+        try:
+            return followRedirects(session, limiter, candidate, timeout, max_redirects), True
+        except (requests.RequestException, ValueError) as e:
+            definite &= definiteFailure(e)
+
+    return None, definite
+
+# a 4xx response or a URL that can't be requested at all (requests' InvalidURL, MissingSchema, ... are ValueErrors),
+# as opposed to a failure that may not happen again
+def definiteFailure(e):
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and 400 <= e.response.status_code < 500
+    return isinstance(e, ValueError)
+
+# list of URLs from url to the page it ends up at
+def followRedirects(session, limiter, url, timeout=10, max_redirects=10):
+    chain = [url]
+
+    for hop in range(max_redirects + 1):
+        with limiter(url):
+            resp = session.head(url, allow_redirects=False, timeout=timeout)
+            if resp.status_code in (405, 501):
+                resp = session.get(url, allow_redirects=False, timeout=timeout, stream=True)
+                resp.close()
+
+        if not resp.is_redirect:
+            resp.raise_for_status()
+            return chain
+
+        url = urljoin(url, resp.headers['location'])
+        if url in chain:
+            raise requests.TooManyRedirects('Redirect loop at ' + url)
+        chain.append(url)
+
+    raise requests.TooManyRedirects('More than ' + str(max_redirects) + ' redirects from ' + chain[0])
@@ -0,0 +1,226 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from usdr.agencies import saveAgencyTreeMap, AGENCY_TREE_PATH
+from usdr.helpers import chunks, make_session
+from usdr.metrics import stage, retryCount
+from usdr.storage import dataPath, saveFrame, loadFrame
+from usdr.schema import applySchema, normalizeUSDR, USDR_DTYPES
+
+''' U.S. DIGITAL REGISTRY (USDR) RECORDS '''
+
+USDR_API_URL = "https://api.gsa.gov/systems/digital-registry/v1/social_media.json"
+
+# fetch all social media records from USDR API
+def fetchUSDR(max_workers=8):
+    with make_session(pool_size=max_workers) as s, stage('fetchUSDR', unit='pages') as progress:
+        d = fetchUSDRPage(s, 1, progress)
+        num_pages = d['metadata']['pages']
+        results = d['results']
+        progress.total = num_pages
+
+        # fetch the rest of the pages concurrently; map() hands them back in page order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for d in executor.map(lambda page: fetchUSDRPage(s, page, progress), range(2, num_pages+1)):
+                results += d['results']
+
+    # create a pandas dataframe from results and save it for later reference
+    df = pd.DataFrame(results)
+    saveUSDR(df)
+    df = applySchema(df, USDR_DTYPES)
+
+    # count how many accounts were fetched
+    print("# of accounts fetched: " + "{:,}".format(len(results)))
+
+    # list platforms by # of accts
+    print(df['service_key'].value_counts())
+
+    return df
+
+# fetch a single page of USDR results; a page without results means we were throttled past our retries,
+# so fail loudly instead of returning a truncated registry. With a metrics stage, the page and its retries are counted.
+def fetchUSDRPage(session, page, progress=None):
+    resp = session.get(USDR_API_URL, params={'page': page}, timeout=60)
+    if progress is not None:
+        progress.progress(api_calls=1, retries=retryCount(resp))
+    resp.raise_for_status()
+    d = resp.json()
+
+    if 'results' not in d:
+        raise RuntimeError('USDR API returned no results for page ' + str(page) + ' (rate limit may have been exceeded): ' + str(d)[:200])
+
+    return d
+
+# update the saved USDR records with only what changed since the last fetch/sync. The API lists records newest
+# first by updated_at, so we page until we reach records older than the newest one we already have and upsert by id.
+# Deleted records don't show up this way; run a full fetchUSDR() now and then to drop them.
+def syncUSDR():
+    if not os.path.exists(dataPath('USDR_accts')):
+        print('No saved USDR records to sync; fetching the full registry instead.')
+        return fetchUSDR()
+
+    results = apiRecords(loadFrame('USDR_accts')).to_dict('records')
+
+    records = {r['id']: r for r in results}
+
+    # ISO 8601 UTC timestamps sort chronologically as strings
+    high_water_mark = max(r['updated_at'] for r in results) if results else ''
+
+    new_records = 0
+    updated_records = 0
+    page = 1
+
+    with make_session(pool_size=1) as s, stage('syncUSDR', unit='pages') as progress:
+        while True:
+            d = fetchUSDRPage(s, page, progress)
+
+            for r in d['results']:
+                if r['updated_at'] < high_water_mark:
+                    continue
+                if r['id'] not in records:
+                    new_records += 1
+                elif records[r['id']] != r:
+                    updated_records += 1
+                records[r['id']] = r
+
+            if (page >= d['metadata']['pages'] or not d['results']
+                    or any(r['updated_at'] < high_water_mark for r in d['results'])):
+                break
+            page += 1
+
+    results = sorted(records.values(), key=lambda r: r['updated_at'], reverse=True)
+
+    df = pd.DataFrame(results)
+    saveUSDR(df)
+    df = applySchema(df, USDR_DTYPES)
+
+    print('Synced USDR records in ' + str(page) + ' requests: ' + str(new_records) + ' new, ' + str(updated_records) + ' updated, ' + "{:,}".format(len(results)) + ' total.')
+
+    return df
+
+# Saved records with the API's own values. Registries saved with typed timestamps (by --stream before it saved the
+# raw records) get them back as the API's ISO 8601 strings, so they compare with the ones it returns.
+def apiRecords(df):
+    for column in ['created_at', 'updated_at']:
+        if column in df and pd.api.types.is_datetime64_any_dtype(df[column]):
+            times = pd.to_datetime(df[column], utc=True)
+            df[column] = (times.dt.strftime('%Y-%m-%dT%H:%M:%S.') + (times.dt.microsecond // 1000).map('{:03d}'.format) + 'Z').where(times.notnull(), None)
+    return df
+
+# fetch all USDR records straight to an NDJSON file (one record per line) as pages arrive, so neither a crash nor
+# the size of the registry costs us the pages already downloaded. After every page we save a checkpoint with the
+# page number and file size; an interrupted run picks up after the last checkpointed page.
+def streamUSDR(path='data/USDR_accts.ndjson', max_workers=8):
+    checkpoint_path = path + '.checkpoint'
+
+    try:
+        with open(checkpoint_path, 'r') as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        checkpoint = None
+
+    # a checkpoint is only good with everything it counted still in the file (it may have been deleted or replaced)
+    if checkpoint is not None and (not os.path.exists(path) or os.path.getsize(path) < checkpoint['size']):
+        print('Starting the USDR download over: ' + path + ' is missing or shorter than its checkpoint.')
+        checkpoint = None
+
+    if checkpoint is None:
+        checkpoint = {'page': 0, 'pages': None, 'size': 0, 'records': 0}
+    else:
+        print('Resuming USDR download after page ' + str(checkpoint['page']) + ' of ' + str(checkpoint['pages']) + '...')
+
+    with make_session(pool_size=max_workers) as s, open(path, 'a+') as file, stage('streamUSDR', unit='pages') as progress:
+        # drop anything written after the last checkpoint (e.g. half a page from a crash)
+        file.truncate(checkpoint['size'])
+
+        if checkpoint['pages'] is None:
+            d = fetchUSDRPage(s, 1, progress)
+            checkpoint['pages'] = d['metadata']['pages']
+            writeUSDRPage(file, checkpoint_path, checkpoint, 1, d['results'])
+
+        remaining_pages = list(range(checkpoint['page'] + 1, checkpoint['pages'] + 1))
+        progress.total = progress.done + len(remaining_pages)
+
+        # only max_workers pages are in flight (and in memory) at a time; they're written in page order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch in chunks(remaining_pages, max_workers):
+                for page, d in zip(batch, executor.map(lambda page: fetchUSDRPage(s, page, progress), batch)):
+                    writeUSDRPage(file, checkpoint_path, checkpoint, page, d['results'])
+
+    # download is complete, so the next run starts over
+    os.remove(checkpoint_path)
+
+    print("# of accounts fetched: " + "{:,}".format(checkpoint['records']))
+
+    return checkpoint['records']
+
+# append one page of records to the NDJSON file and checkpoint it
+def writeUSDRPage(file, checkpoint_path, checkpoint, page, results):
+    for r in results:
+        file.write(json.dumps(r) + '\n')
+    file.flush()
+
+    checkpoint['page'] = page
+    checkpoint['size'] = file.tell()
+    checkpoint['records'] += len(results)
+
+    # write to a temp file and swap it in, so a crash never leaves a half-written checkpoint
+    with open(checkpoint_path + '.tmp', 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+# save the USDR records, plus the agency dimension and account-agency link tables split out of them, and the agencies'
+# places in the agency tree when there is one
+def saveUSDR(df):
+    saveFrame(df, 'USDR_accts')
+
+    tables = normalizeUSDR(df[['id', 'agencies']])
+    saveFrame(tables['agencies'], 'USDR_agencies')
+    saveFrame(tables['account_agencies'], 'USDR_account_agencies')
+    if os.path.exists(AGENCY_TREE_PATH):
+        saveAgencyTreeMap(tables['agencies'])
+
+# load saved USDR social media records, reading only the given columns if any. With chunksize, read the NDJSON
+# file written by streamUSDR() instead and yield dataframes of up to chunksize records each. dtypes=None leaves the
+# records as the API returned them (e.g. to save them with saveUSDR). The agencies and tags columns hold a list per
+# record; leave them out of columns and use loadAgencyTables() where memory matters.
+def loadUSDR(columns=None, chunksize=None, dtypes=USDR_DTYPES):
+    if chunksize:
+        return loadUSDRChunks('data/USDR_accts.ndjson', chunksize, columns, dtypes)
+
+    return applySchema(loadFrame('USDR_accts', columns=columns), dtypes or {})
+
+def loadUSDRChunks(path, chunksize, columns=None, dtypes=USDR_DTYPES):
+    with open(path, 'r') as file:
+        results = []
+        for line in file:
+            results.append(json.loads(line))
+            if len(results) == chunksize:
+                yield applySchema(pd.DataFrame(results, columns=columns), dtypes or {})
+                results = []
+        if results:
+            yield applySchema(pd.DataFrame(results, columns=columns), dtypes or {})
+
+# Returns (account_agencies, agencies), both indexed by agency ID, so looking up an agency's accounts or details is
+# an index lookup. Built from the saved records if they were saved before these tables were.
+def loadAgencyTables():
+    if not os.path.exists(dataPath('USDR_account_agencies')):
+        saveUSDR(loadFrame('USDR_accts'))
+
+    account_agencies = loadFrame('USDR_account_agencies').set_index('agency_id').sort_index()
+    agencies = loadFrame('USDR_agencies').set_index('agency_id').sort_index()
+
+    return account_agencies, agencies
+
+# the accounts listed under any of the given agencies, by an integer join on the link table
+def agencyAccounts(accts, agency_ids, account_agencies=None):
+    if account_agencies is None:
+        account_agencies, agencies = loadAgencyTables()
+
+    agency_ids = [agency_id for agency_id in agency_ids if agency_id in account_agencies.index]
+    account_ids = account_agencies.loc[agency_ids, 'account_id'].unique()
+
+    return accts[accts['id'].isin(account_ids)]
@@ -0,0 +1,138 @@
+import html
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from usdr.cube import aggregateMerged, cubeSummary, ALL_AGENCIES
+
+''' SUMMARY REPORT '''
+
+# The report is a table with a row per statistic and a column per platform, worked out from the cube's summary
+# (cubeSummary) in one go, then rendered as text, JSON, CSV or HTML by formatReport(). The cube can hold any
+# number of platforms; each one gets a column.
+
+def print3col(a,b,c,d=''):   # assumes a is text, b and c are ints, and d is a percent, unless otherwise (in which case they're all strings)
+    try:
+        if (0 < b <= 1 and 0 < c <=1):
+            print('{0:<30} {1:>10.1%} {2:>10.1%} {3}'.format(a,b,c,d))
+        else:
+            print('{0:<30} {1:>10,} {2:>10,} {3}'.format(a,b,c,d))
+    except:
+        print('{0:<30} {1:>10} {2:>10} {3}'.format(a,b,c,d))
+
+# run stats on merged Twitter and Facebook results
+def printReport(twitter_merged, facebook_merged, **merged):
+    printCubeReport(aggregateMerged(twitter_merged, facebook_merged, **merged))
+
+# report lines for each last posted category, and whether to show them as a % of accounts found
+RECENCY_LINES = [
+    ('within last 24 hours', 'Less than 24 hours ago:', True),
+    ('within last week', 'Within the last week:', True),
+    ('within last month', 'Within the last month:', False),
+    ('within last year', 'Within the last year:', False),
+    ('more than a year ago', 'More than a year ago:', False),
+    ('never posted', 'Never posted:', False),
+]
+
+# (section, statistic, label, unit, numerator, denominator) for each report row, in order; numerator and denominator
+# are cubeSummary rows, and percent rows divide one by the other
+REPORT_ROWS = [
+    ('accounts', 'usdr_records', 'Total USDR records:', 'count', 'Total USDR records', None),
+    ('accounts', 'usernames', 'Unique usernames:', 'count', 'Unique usernames', None),
+    ('accounts', 'found_accounts', 'Accounts found using APIs:', 'count', 'Accounts found using APIs', None),
+    ('accounts', 'found_percent', '   % of unique screen names:', 'percent', 'Accounts found using APIs', 'Unique usernames'),
+    ('accounts', 'verified', 'Verified (with checkmark): ', 'count', 'Verified (with checkmark)', None),
+    ('accounts', 'verified_percent', '   % of accounts found in API:', 'percent', 'Verified (with checkmark)', 'Accounts found using APIs'),
+]
+for category, label, show_percent in RECENCY_LINES:
+    REPORT_ROWS.append(('recency', category, label, 'count', category, None))
+    if show_percent:
+        REPORT_ROWS.append(('recency', category + ' percent', '   % of accounts found in API:', 'percent', category, 'Accounts found using APIs'))
+
+# heading printed above each section in the text and HTML reports
+SECTION_TITLES = {'accounts': '', 'recency': 'MOST RECENT POST BY CATEGORY'}
+
+REPORT_FORMATS = ['text', 'json', 'csv', 'html']
+
+# The report for one agency (or all of them) from the cube: indexed by statistic, with section, label and unit
+# columns and then a column per platform. Percentages are fractions (NaN where there's nothing to divide by).
+def summarizeReport(cube, agency_id=ALL_AGENCIES):
+    summary = cubeSummary(cube, agency_id).astype(float)
+    rows = pd.DataFrame(REPORT_ROWS, columns=['section', 'statistic', 'label', 'unit', 'numerator', 'denominator'])
+
+    values = np.array(summary.loc[rows['numerator']].values, dtype=float)
+    percent = rows['denominator'].notnull().values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values[percent] = values[percent] / summary.loc[rows.loc[percent, 'denominator']].values
+    values[percent] = np.where(np.isfinite(values[percent]), values[percent], np.nan)
+
+    report = pd.concat([rows[['section', 'label', 'unit']], pd.DataFrame(values, columns=summary.columns)], axis=1)
+    report.index = rows['statistic'].values
+    report.index.name = 'statistic'
+
+    return report
+
+def platformColumns(report):
+    return [c for c in report.columns if c not in ('section', 'label', 'unit')]
+
+def formatValue(value, unit):
+    if pd.isnull(value):
+        return '-'
+    return '{:.1%}'.format(value) if unit == 'percent' else '{:,}'.format(int(value))
+
+# the report as text (the console report), json, csv or html
+def formatReport(report, format='text'):
+    if format not in REPORT_FORMATS:
+        raise ValueError('Unknown report format "' + str(format) + '"; choose from: ' + ', '.join(REPORT_FORMATS))
+    return globals()['format' + format.capitalize()](report)
+
+def formatText(report):
+    platforms = platformColumns(report)
+    lines = []
+    for section, rows in report.groupby('section', sort=False):
+        lines.append(textLine(SECTION_TITLES.get(section, section.upper()), [p.upper() for p in platforms]))
+        for row in rows.itertuples(index=False):
+            lines.append(textLine(row.label, [formatValue(value, row.unit) for value in row[3:]]))
+    return '\n'.join(lines) + '\n'
+
+def textLine(label, values):
+    return '{0:<30}'.format(label) + ''.join(' {0:>10}'.format(value) for value in values) + ' '
+
+def formatJson(report):
+    platforms = platformColumns(report)
+    rows = [{'statistic': statistic, 'section': row['section'], 'label': row['label'].strip(), 'unit': row['unit'],
+             'values': {p: None if pd.isnull(row[p]) else (int(row[p]) if row['unit'] == 'count' else float(row[p])) for p in platforms}}
+            for statistic, row in report.iterrows()]
+    return json.dumps({'platforms': platforms, 'rows': rows}, indent=2) + '\n'
+
+def formatCsv(report):
+    platforms = platformColumns(report)
+    report = report.astype({p: object for p in platforms}).assign(label=report['label'].str.strip())
+    counts = report['unit'] == 'count'
+    report.loc[counts, platforms] = report.loc[counts, platforms].map(int)
+    file = io.StringIO()
+    report.to_csv(file)
+    return file.getvalue()
+
+def formatHtml(report):
+    platforms = platformColumns(report)
+    lines = ['<table class="summaryTable">']
+    for section, rows in report.groupby('section', sort=False):
+        lines.append('<tr><th>' + html.escape(SECTION_TITLES.get(section, section.upper())) + '</th>' +
+                     ''.join('<th>' + html.escape(p.upper()) + '</th>' for p in platforms) + '</tr>')
+        for row in rows.itertuples(index=False):
+            lines.append('<tr class="' + row.unit + '"><td>' + html.escape(row.label.strip()) + '</td>' +
+                         ''.join('<td>' + formatValue(value, row.unit) + '</td>' for value in row[3:]) + '</tr>')
+    lines.append('</table>')
+    return '\n'.join(lines) + '\n'
+
+# the report from the aggregate cube, for all agencies or just one
+def printCubeReport(cube, agency_id=ALL_AGENCIES):
+    print(formatText(summarizeReport(cube, agency_id)), end='')
+
+# write the report in the given format to path
+def saveReport(cube, path, format='text', agency_id=ALL_AGENCIES):
+    with open(path, 'w') as file:
+        file.write(formatReport(summarizeReport(cube, agency_id), format))
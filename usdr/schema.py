@@ -0,0 +1,175 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+''' SCHEMA '''
+
+# Column types for the frames we load. Everything comes back from JSON/Parquet as strings and Python objects, so
+# loaders run these through applySchema: low-cardinality strings become categoricals (stored once, plus a small
+# integer code per row), counts become the smallest integer type that fits and timestamps become datetimes.
+# Columns that aren't listed, or aren't in the frame, are left alone.
+
+# Twitter timestamps look like 'Wed Aug 27 13:08:45 +0000 2008', which pandas can't infer a format for, so without it
+# they're parsed one at a time
+TWITTER_TIME_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+USDR_DTYPES = {
+    'service_key': 'category',
+    'service_display_name': 'category',
+    'language': 'category',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+}
+
+TWITTER_DTYPES = {
+    'followers_count': 'integer',
+    'friends_count': 'integer',
+    'statuses_count': 'integer',
+    'favourites_count': 'integer',
+    'listed_count': 'integer',
+    'verified': 'bool',
+    'protected': 'bool',
+    'geo_enabled': 'bool',
+    'lang': 'category',
+    'time_zone': 'category',
+    'created_at': ('datetime', TWITTER_TIME_FORMAT),
+    'last_api_call': 'datetime',
+    'last_posted_category': 'category',
+}
+
+FACEBOOK_DTYPES = {
+    'fan_count': 'integer',
+    'talking_about_count': 'integer',
+    'checkins': 'integer',
+    'rating_count': 'integer',
+    'is_valid': 'bool',
+    'is_verified': 'bool',
+    'can_checkin': 'bool',
+    'is_always_open': 'bool',
+    'is_community_page': 'bool',
+    'is_permanently_closed': 'bool',
+    'is_unclaimed': 'bool',
+    'category': 'category',
+    'verification_status': 'category',
+    'error': 'category',
+    'last_api_call': 'datetime',
+    'last_posted_category': 'category',
+}
+
+YOUTUBE_DTYPES = {
+    'view_count': 'integer',
+    'subscriber_count': 'integer',
+    'video_count': 'integer',
+    'created_at': 'datetime',
+    'last_api_call': 'datetime',
+    'last_posted_category': 'category',
+}
+
+# A dtype is one of 'category', 'integer', 'bool' and 'datetime', or ('datetime', format) for timestamps in a fixed
+# format that pandas can't work out by itself
+def applySchema(df, dtypes):
+    for column, dtype in dtypes.items():
+        if column not in df:
+            continue
+        dtype, time_format = dtype if isinstance(dtype, tuple) else (dtype, None)
+        values = df[column]
+        has_nulls = values.isnull().any()
+
+        if dtype == 'category':
+            df[column] = values.astype('category')
+        elif dtype == 'integer':
+            # integer types can't hold NaN, so columns with missing values stay float
+            df[column] = pd.to_numeric(values) if has_nulls else pd.to_numeric(values, downcast='integer')
+        elif dtype == 'bool':
+            if not has_nulls:
+                df[column] = values.astype(bool)
+        elif dtype == 'datetime':
+            df[column] = parseDatetimes(values, time_format)
+
+    return df
+
+# parse a column of timestamps in one vectorized pass when they're in the given format, falling back to parsing them
+# one by one if some aren't
+def parseDatetimes(values, time_format=None):
+    if time_format is not None and not pd.api.types.is_datetime64_any_dtype(values):
+        try:
+            return pd.to_datetime(values, format=time_format)
+        except (ValueError, TypeError):
+            pass
+    return pd.to_datetime(values)
+
+''' NORMALIZED TABLES '''
+
+# Split the nested agencies/tags lists out of the USDR records into their own tables, so the account frame holds no
+# Python objects and each agency/tag is stored once, keyed by its integer ID:
+#   agencies (agency_id, name, info_url), account_agencies (account_id, agency_id),
+#   tags (tag_id, tag_text), account_tags (account_id, tag_id)
+def normalizeUSDR(accts):
+    tables = {'accounts': accts.drop(['agencies', 'tags'], axis=1, errors='ignore')}
+
+    for column, name, key in [('agencies', 'agencies', 'agency_id'), ('tags', 'tags', 'tag_id')]:
+        if column not in accts:
+            continue
+        account_ids, items = explodeLists(accts['id'].values, accts[column].values)
+        item_ids = pd.to_numeric(pd.Series([item['id'] for item in items], dtype='int64'), downcast='integer')
+
+        # the dimension table only needs the first copy of each agency/tag
+        first = np.flatnonzero(~item_ids.duplicated().values)
+        details = pd.DataFrame([items[i] for i in first], columns=None if len(first) else ['id']).drop('id', axis=1)
+        details.insert(0, key, item_ids.values[first])
+
+        tables['account_' + name] = pd.DataFrame({'account_id': account_ids, key: item_ids.values})
+        tables[name] = details
+
+    return tables
+
+# one (id, item) pair per item in each row's list, built in bulk: the ids are repeated by list length in one numpy
+# call and the lists concatenated in one pass, instead of appending row by row. Rows without a list have no items.
+def explodeLists(ids, lists):
+    lists = [x if isinstance(x, list) else [] for x in lists]
+    lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    return np.repeat(ids, lengths), list(itertools.chain.from_iterable(lists))
+
+# Move a column of dicts (Twitter status, Facebook feed) into its own table keyed by the row's id
+def splitDicts(df, column, key='id', prefix=''):
+    rows = df[column].map(lambda x: isinstance(x, dict))
+    table = pd.DataFrame(df.loc[rows, column].tolist()).add_prefix(prefix)
+    table.insert(0, key, df.loc[rows, key].values)
+
+    return df.drop(column, axis=1), table
+
+def normalizeTwitter(twitter_api):
+    users, statuses = splitDicts(twitter_api, 'status', key='id', prefix='status_')
+    return {'users': users, 'statuses': statuses}
+
+# only the most recent post is requested from the feed (feed.limit(1)), so keep that one
+def normalizeFacebook(facebook_api):
+    pages = facebook_api.copy()
+    if 'feed' in pages:
+        pages['feed'] = pages['feed'].map(lambda x: x['data'][0] if isinstance(x, dict) and x.get('data') else None)
+    pages, posts = splitDicts(pages, 'feed', key='id', prefix='post_')
+    return {'pages': pages, 'posts': posts}
+
+''' MEMORY REPORT '''
+
+# bytes per column before and after (e.g. raw vs. typed/normalized), including the Python objects in object columns.
+# tables are any normalized tables split out of the "after" frame; each gets its own row so the total is honest.
+def memoryReport(before, after, tables=None):
+    report = pd.DataFrame({'before': before.memory_usage(index=False, deep=True),
+                           'after': after.memory_usage(index=False, deep=True)}).fillna(0)
+    for name, table in (tables or {}).items():
+        report.loc['[' + name + ' table]'] = [0, table.memory_usage(index=False, deep=True).sum()]
+    report.loc['TOTAL'] = report.sum()
+    report['dtype_before'] = before.dtypes.astype(str)
+    report['dtype_after'] = after.dtypes.astype(str)
+    report['saved'] = 1 - report['after'] / report['before']
+
+    return report
+
+def printMemoryReport(before, after, tables=None):
+    report = memoryReport(before, after, tables)
+    print('{0:<30} {1:>12} {2:>12} {3:>8}'.format('COLUMN', 'BEFORE', 'AFTER', 'SAVED'))
+    for column, row in report.iterrows():
+        print('{0:<30} {1:>12,.0f} {2:>12,.0f} {3:>8}'.format(str(column), row['before'], row['after'],
+                                                            '{:.1%}'.format(row['saved']) if row['before'] else ''))
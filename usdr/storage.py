@@ -0,0 +1,101 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from usdr.parallel import mapPartitions
+
+''' COLUMNAR STORAGE '''
+
+# Results are saved as compressed Parquet files in data/, one per dataset, so loaders can read just the columns
+# they need. Parquet columns are typed, so nested values (USDR agencies/tags, Twitter status, Facebook feed, ...)
+# and columns mixing types are stored as JSON text and decoded again when they're loaded.
+
+def dataPath(name):
+    return 'data/' + name + '.parquet'
+
+def saveFrame(df, name):
+    df = df.copy()
+    json_columns = []
+
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        if values.map(lambda x: isinstance(x, (dict, list))).any() or not arrowCompatible(values):
+            df[column] = values.map(lambda x: json.dumps(x, default=str) if isinstance(x, (dict, list)) or not pd.isnull(x) else None)
+            json_columns.append(column)
+
+    # the pandas index is just a row number everywhere we save frames
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'usdr_json_columns'] = json.dumps(json_columns).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    pq.write_table(table, dataPath(name), compression='snappy')
+
+def loadFrame(name, columns=None):
+    table = pq.read_table(dataPath(name), columns=columns)
+    df = table.to_pandas()
+
+    # decoded on worker processes for big frames (see usdr/parallel.py)
+    for column in jsonColumns(table.schema):
+        if column in df:
+            df[column] = mapPartitions(decodeJSON, df[column])
+
+    return df
+
+def decodeJSON(values):
+    return values.map(lambda x: json.loads(x) if isinstance(x, str) else None)
+
+# column names saved in a file, read from its footer without loading any data
+def frameColumns(name):
+    return pq.read_schema(dataPath(name)).names
+
+def jsonColumns(schema):
+    metadata = schema.metadata or {}
+    return json.loads(metadata.get(b'usdr_json_columns', b'[]').decode('utf-8'))
+
+def arrowCompatible(values):
+    try:
+        pa.array(values, from_pandas=True)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return False
+
+''' OLDER JSON RESULTS '''
+
+# Before they were Parquet files, results were saved as data/<name>.json: the USDR and Twitter results as a list of
+# records, the Facebook ones as the JSON text of DataFrame.to_json() (column -> {row number: value}, with times as
+# milliseconds since the epoch). convertJSONResults() saves each one that has no Parquet file yet as one, so results
+# fetched before the switch can still be loaded; the .json files are left where they are. The pipeline runs it before
+# any stage.
+
+JSON_RESULTS = ['USDR_accts', 'Twitter_API_Results', 'Facebook_API_Results_by_URL', 'Facebook_API_Results_by_ID']
+
+# the names converted
+def convertJSONResults(names=JSON_RESULTS):
+    converted = []
+    for name in names:
+        if os.path.exists(jsonPath(name)) and not os.path.exists(dataPath(name)):
+            saveFrame(loadJSONFrame(name), name)
+            converted.append(name)
+            print('Converted ' + jsonPath(name) + ' to ' + dataPath(name) + '.')
+    return converted
+
+def jsonPath(name):
+    return 'data/' + name + '.json'
+
+def loadJSONFrame(name):
+    with open(jsonPath(name), 'r') as file:
+        results = json.load(file)
+
+    if isinstance(results, str):
+        columns = json.loads(results)
+        df = pd.DataFrame(columns)
+        df = df.iloc[df.index.astype(int).argsort()].reset_index(drop=True)
+        if 'last_api_call' in df and pd.api.types.is_numeric_dtype(df['last_api_call']):
+            df['last_api_call'] = pd.to_datetime(df['last_api_call'], unit='ms')
+        return df
+
+    return pd.DataFrame(results)
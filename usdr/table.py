@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from usdr.agencies import loadAgencyHierarchy, loadAgencyTreeMap, mapUSDRAgencies, AGENCY_TREE_PATH
+from usdr.registry import loadUSDR
+from usdr.schema import normalizeUSDR
+from usdr.storage import loadFrame, dataPath
+from usdr.recency import recencyLabels
+
+''' RESULTS TABLE '''
+
+# columns shown in the dashboard's results table, in order
+TABLE_COLUMNS = ['organization', 'account', 'service_display_name', 'agency_names', 'last_posted_category', 'service_url']
+
+class ResultsTable(object):
+    '''
+    In-memory, indexed view of the registry for the dashboard, queried a page at
+    a time, e.g. ResultsTable().query(start=50, length=25, sort='organization',
+    platform='twitter', recency='within last week'). Filters are integer
+    comparisons on categorical codes plus a row index per agency (departments
+    go through the agency tree to the USDR agencies under them), and the sort
+    order of each column is computed once and reused, so a query over 100k+
+    accounts only touches the rows on the page it returns.
+    '''
+
+    def __init__(self, accts=None, recency=None, hierarchy=None, tree_map=None):
+        saved = accts is None
+        if saved:
+            accts = loadUSDR(columns=['id', 'organization', 'account', 'service_key', 'service_display_name', 'service_url', 'agencies'])
+        if recency is None:
+            recency = loadRecency()
+
+        tables = normalizeUSDR(accts)
+        df = tables['accounts'].reset_index(drop=True)
+
+        # agencies are shown by name, and indexed by ID: agency ID -> positions of its accounts
+        positions = pd.Series(np.arange(len(df)), index=df['id'].values)
+        links = tables.get('account_agencies', pd.DataFrame()).reindex(columns=['account_id', 'agency_id'])
+        agencies = tables.get('agencies', pd.DataFrame()).reindex(columns=['agency_id', 'name'])
+        links = pd.DataFrame({'row': positions.reindex(links['account_id'].values).values, 'agency_id': links['agency_id'].values})
+        self.agency_rows = {agency_id: rows.values for agency_id, rows in links.groupby('agency_id')['row']}
+        self.agencies = agencies.sort_values('name').reset_index(drop=True)
+
+        # departments (the top of the agency tree, when there is one) and the tree node of each USDR agency
+        if hierarchy is None and os.path.exists(AGENCY_TREE_PATH):
+            hierarchy = loadAgencyHierarchy()
+        if tree_map is None and hierarchy is not None:
+            tree_map = loadAgencyTreeMap() if saved else mapUSDRAgencies(agencies, hierarchy)
+        self.hierarchy, self.tree_map = hierarchy, tree_map
+        self.departments = pd.DataFrame({'agency_id': pd.Series(dtype='int64'), 'title': pd.Series(dtype=object)})
+        if hierarchy is not None:
+            mapped = tree_map.dropna(subset=['tree_id'])
+            departments = hierarchy.rollup(mapped, ['agency_id'], level=0, agency_column='tree_id', aggfunc='count')
+            self.departments = pd.DataFrame({'agency_id': departments.index.values, 'title': departments['title'].values})
+            self.departments = self.departments.sort_values('title').reset_index(drop=True)
+
+        df['agency_names'] = [', '.join(agency['name'] for agency in items) if isinstance(items, list) else ''
+                              for items in accts['agencies']] if 'agencies' in accts else ''
+        df['last_posted_category'] = pd.Categorical(df['id'].map(recency), categories=recencyLabels())
+        for column in ['organization', 'account', 'service_url', 'agency_names']:
+            df[column] = df[column].fillna('')
+
+        self.df = df
+        self.search_text = (df['organization'] + ' ' + df['account'] + ' ' + df['agency_names']).str.lower()
+        self.sort_orders = {}
+
+    # returns (rows in the table, rows matching the filters, DataFrame of the requested page)
+    def query(self, start=0, length=25, sort=None, ascending=True, platform=None, agency=None, recency=None, search=None,
+              department=None):
+        mask = np.ones(len(self.df), dtype=bool)
+
+        if platform:
+            mask &= categoryMask(self.df['service_key'], platform)
+        if recency:
+            mask &= categoryMask(self.df['last_posted_category'], recency)
+        if agency:
+            mask &= self.agencyMask([int(agency)])
+        if department:
+            mask &= self.agencyMask(self.departmentAgencies(int(department)))
+        if search:
+            mask &= self.search_text.str.contains(search.lower(), regex=False).values
+
+        order = self.sortOrder(sort) if sort else np.arange(len(self.df))
+        if not ascending:
+            order = order[::-1]
+        matching = order[mask[order]]
+
+        page = self.df.iloc[matching[start:start + length]]
+
+        return len(self.df), len(matching), page[TABLE_COLUMNS]
+
+    # rows listed under any of the USDR agencies
+    def agencyMask(self, agency_ids):
+        mask = np.zeros(len(self.df), dtype=bool)
+        for agency_id in agency_ids:
+            mask[self.agency_rows.get(agency_id, [])] = True
+        return mask
+
+    # USDR agencies at a node of the agency tree or anywhere below it
+    def departmentAgencies(self, tree_id):
+        if self.hierarchy is None:
+            return []
+        return self.tree_map.loc[self.tree_map['tree_id'].isin(self.hierarchy.subtree(tree_id)).fillna(False).values, 'agency_id'].tolist()
+
+    # row positions in order of the column, computed the first time the column is sorted on
+    def sortOrder(self, column):
+        if column not in self.sort_orders:
+            values = self.df[column]
+            if str(values.dtype) == 'category':
+                values = values.cat.codes
+            else:
+                values = values.astype(str).str.lower()
+            self.sort_orders[column] = np.argsort(values.values, kind='mergesort')
+        return self.sort_orders[column]
+
+    # choices for the filter dropdowns
+    def filterOptions(self):
+        platforms = self.df[['service_key', 'service_display_name']].drop_duplicates().dropna().sort_values('service_display_name')
+        return {
+            'platform': list(zip(platforms['service_key'].astype(str), platforms['service_display_name'].astype(str))),
+            'agency': list(zip(self.agencies['agency_id'], self.agencies['name'])),
+            'department': list(zip(self.departments['agency_id'], self.departments['title'])),
+            'recency': [(label, label) for label in recencyLabels()],
+        }
+
+# comparing integer codes instead of strings; a value the column has never seen matches nothing
+def categoryMask(values, value):
+    values = values.astype('category')
+    categories = list(values.cat.categories)
+    if value not in categories:
+        return np.zeros(len(values), dtype=bool)
+    return values.cat.codes.values == categories.index(value)
+
+# last_posted_category by USDR account ID from the saved merged frames, for the platforms that have been merged
+def loadRecency():
+    recency = []
+    for name in ['twitter_merged', 'facebook_merged', 'youtube_merged']:
+        if os.path.exists(dataPath(name)):
+            merged = loadFrame(name, columns=['id_usdr', 'last_posted_category']).dropna(subset=['id_usdr'])
+            recency.append(pd.Series(merged['last_posted_category'].values, index=merged['id_usdr'].astype(int).values))
+    if not recency:
+        return pd.Series()
+    recency = pd.concat(recency)
+    return recency[~recency.index.duplicated()]
@@ -0,0 +1,104 @@
+import pandas as pd
+
+from usdr.changes import DerivedColumns
+from usdr.helpers import getLastTweet, getLastFacebookPost, getLastYouTubeVideo
+from usdr.joins import IndexedJoin
+from usdr.parallel import mapPartitions
+from usdr.recency import lastPostedCategories
+from usdr.schema import parseDatetimes, TWITTER_TIME_FORMAT
+from usdr.storage import loadFrame
+from usdr.usernames import get_usernames, generate_urls
+
+''' CLEANUP AND MERGE STEPS '''
+
+# convert dates and parse usernames/URLs out of the raw USDR records (on worker processes for big registries, see
+# usdr/parallel.py)
+def prepareAccounts(accts):
+    parsed = mapPartitions(parseAccounts, accts[['service_key', 'service_url', 'created_at', 'updated_at']])
+    for column in parsed.columns:
+        accts[column] = parsed[column]
+
+    return accts
+
+def parseAccounts(accts):
+    parsed = accts[['created_at','updated_at']].apply(pd.to_datetime)
+
+    # get lowercase screen name from URL
+    parsed['username'] = get_usernames(accts['service_key'], accts['service_url'])
+
+    parsed['url_from_username'] = generate_urls(accts['service_key'], parsed['username'])
+
+    return parsed
+
+# Twitter/Facebook/YouTube records that haven't changed since the last run get their derived columns from the saved
+# ones (see usdr/changes.py) instead of parsing them again; last_posted_category depends on when they were fetched,
+# so it's bucketed again for every record. incremental=False derives every record. The records that are derived
+# are split between worker processes for big frames (see usdr/parallel.py).
+
+def prepareTwitter(twitter_api, incremental=True):
+    twitter_api = TWITTER_DERIVED.apply(twitter_api, incremental)
+
+    twitter_api['last_posted_category'] = lastPostedCategories(twitter_api['last_posted_at'], twitter_api['last_api_call'])
+
+    return twitter_api
+
+def deriveTwitter(twitter_api):
+    derived = pd.DataFrame({'last_posted_at': parseDatetimes(twitter_api['status'].apply(getLastTweet), TWITTER_TIME_FORMAT),
+                            'created_at': parseDatetimes(twitter_api['created_at'], TWITTER_TIME_FORMAT)})
+
+    derived['screen_name_capitalized'] = twitter_api['screen_name']
+    derived['screen_name'] = twitter_api['screen_name'].apply(str.lower)
+
+    return derived
+
+def prepareFacebook(facebook_api, incremental=True):
+    facebook_api = FACEBOOK_DERIVED.apply(facebook_api, incremental)
+
+    facebook_api['last_posted_category'] = lastPostedCategories(facebook_api['last_posted_at'], facebook_api['last_api_call'])
+
+    return facebook_api
+
+def deriveFacebook(facebook_api):
+    return pd.DataFrame({'last_posted_at': pd.to_datetime(facebook_api['feed'].apply(getLastFacebookPost))})
+
+def prepareYouTube(youtube_api, incremental=True):
+    youtube_api = YOUTUBE_DERIVED.apply(youtube_api, incremental)
+
+    youtube_api['last_posted_category'] = lastPostedCategories(youtube_api['last_posted_at'], youtube_api['last_api_call'])
+
+    return youtube_api
+
+def deriveYouTube(youtube_api):
+    return pd.DataFrame({'last_posted_at': pd.to_datetime(youtube_api['latest_upload'].apply(getLastYouTubeVideo))})
+
+TWITTER_DERIVED = DerivedColumns('Twitter_API_Derived', 'id', ['last_posted_at', 'created_at', 'screen_name_capitalized', 'screen_name'],
+                                 deriveTwitter, ['status', 'created_at', 'screen_name'])
+FACEBOOK_DERIVED = DerivedColumns('Facebook_API_Derived', 'url', ['last_posted_at'], deriveFacebook, ['feed'])
+YOUTUBE_DERIVED = DerivedColumns('YouTube_API_Derived', 'url', ['last_posted_at'], deriveYouTube, ['latest_upload'])
+
+# Registry records change when their updated_at does, and API results when their content hash or last posted
+# category does (fetching an unchanged record again doesn't count), so those columns are all the merges hash to tell
+# what changed. A refetch that changed nothing doesn't rewrite the saved merge, which keeps the last_api_call it had.
+USDR_VERSION = ['id', 'updated_at']
+TWITTER_VERSION = ['id', 'content_hash', 'last_posted_category']
+FACEBOOK_VERSION = ['id', 'content_hash', 'last_posted_category']
+YOUTUBE_VERSION = ['id', 'content_hash', 'last_posted_category']
+
+# Merge the two datasets on the lower-case screen name field (an outer join, saved as twitter_merged). With
+# incremental, the saved key index is reused and the merged file is only rewritten if some account changed.
+def mergeTwitter(twitter_accts, twitter_api, incremental=True):
+    join = IndexedJoin('twitter_merged', 'username', 'screen_name', ('_usdr', '_api'), USDR_VERSION, TWITTER_VERSION)
+    return join.join(twitter_accts, twitter_api, incremental)
+
+def mergeFacebook(facebook_accts, facebook_api, incremental=True):
+    join = IndexedJoin('facebook_merged', 'url_from_username', 'url', ('_usdr', '_api'), USDR_VERSION, FACEBOOK_VERSION)
+    return join.join(facebook_accts, facebook_api, incremental)
+
+# YouTube results are keyed by the registry's own service_url (see fetchYouTube)
+def mergeYouTube(youtube_accts, youtube_api, incremental=True):
+    join = IndexedJoin('youtube_merged', 'service_url', 'url', ('_usdr', '_api'), USDR_VERSION, YOUTUBE_VERSION)
+    return join.join(youtube_accts, youtube_api, incremental)
+
+# load the saved merged frames, reading only the given columns if any
+def loadMerged(columns=None):
+    return loadFrame('twitter_merged', columns=columns), loadFrame('facebook_merged', columns=columns)
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pandas as pd
+import twitter   # This is @bear's Python-Twitter wrapper: https://github.com/bear/python-twitter
+
+from usdr.fetchers import PlatformFetcher
+from usdr.storage import saveFrame, loadFrame
+from usdr.schema import applySchema, TWITTER_DTYPES
+
+''' TWITTER API '''
+
+TWITTER_LOOKUP_URL = 'https://api.twitter.com/1.1/users/lookup.json'
+
+def fetchTwitter(username_list, cache=None, executor=None):
+    results, fetched_at, errors = TwitterFetcher().fetch(username_list, cache=cache, executor=executor)
+
+    total_results = len(results)
+    print('\rFound information for ' + str(total_results) + ' screen names.')
+
+    df = pd.DataFrame(list(results.values()))
+
+    # UTC, like the timestamps the API returns
+    df['last_api_call'] = pd.to_datetime([fetched_at[username] for username in results], unit='s')
+
+    # save results for later reference
+    saveFrame(df, 'Twitter_API_Results')
+
+    return applySchema(df, TWITTER_DTYPES)
+
+class TwitterFetcher(PlatformFetcher):
+    '''
+    UsersLookup by screen name, 100 per request, spread across every
+    credential set in settings.py (one batch in flight per set).
+    '''
+
+    name = 'twitter'
+    stage_name = 'fetchTwitter'
+    title = 'Twitter API'
+    noun = 'screen names'
+    batch_size = 100
+    # users/lookup allows 900 requests per 15 minutes per credential set; TwitterScheduler tracks each set's
+    # remaining budget from the response headers rather than counting calls here
+    rate_limit = None
+
+    # chunks go to whichever credential set has rate limit budget left
+    def connect(self):
+        apis = getTwitterAPIs()
+        self.max_workers = len(apis)
+        print('Using ' + str(len(apis)) + ' Twitter credential set(s).')
+        return TwitterScheduler(apis)
+
+    # results are keyed by the screen name we asked for, including the ones the API didn't return
+    def fetchBatch(self, scheduler, batch):
+        users = scheduler.lookup(batch)
+        found = {user['screen_name'].lower(): user for user in users}
+        return {username: found.get(username.lower()) for username in batch}, {}, 1
+
+    def finish(self, scheduler, progress):
+        progress.count('api_calls', scheduler.calls - progress.counts.get('api_calls', 0))
+        progress.count('rate_limited', scheduler.rate_limited)
+        progress.count('rate_limit_wait_seconds', round(scheduler.wait_seconds, 1))
+
+# settings is only needed once we actually call the API, so importing usdr works without API keys.
+# settings.twitter_credentials may list several credential sets (dicts with consumer_key, consumer_secret,
+# access_token_key and access_token_secret); otherwise the single set of twitter_* keys is used.
+def getTwitterAPIs():
+    import settings  # Be sure to add your platform API consumer keys/secrets to settings.py or this won't work
+
+    credentials = getattr(settings, 'twitter_credentials', None) or [{'consumer_key': settings.twitter_consumer_key,
+                                                                      'consumer_secret': settings.twitter_consumer_secret,
+                                                                      'access_token_key': settings.twitter_access_key,
+                                                                      'access_token_secret': settings.twitter_access_secret}]
+
+    # the scheduler does the waiting, so a client never sleeps while it holds a chunk
+    return [twitter.Api(sleep_on_rate_limit = False, **c) for c in credentials]
+
+class TwitterScheduler(object):
+    '''
+    Shares UsersLookup calls between several API clients. Each client (token) is used by one
+    thread at a time; after every call we record the remaining rate limit budget and reset time
+    from the response headers, and a token that's out of budget sits idle until its window resets.
+    '''
+
+    def __init__(self, apis, url=TWITTER_LOOKUP_URL):
+        self.url = url
+        self.tokens = [{'api': api, 'remaining': 1, 'reset': 0, 'busy': False} for api in apis]
+        self.condition = threading.Condition()
+
+        # for the metrics: calls made, calls refused for rate limiting, and time spent waiting for a token
+        self.calls = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+
+    def lookup(self, chunk):
+        while True:
+            token = self.acquire()
+            try:
+                users = token['api'].UsersLookup(screen_name = chunk)
+            except twitter.TwitterError as e:
+                error_code = getTwitterErrorCode(e)
+                if error_code == 88:  # rate limit exceeded; put the chunk back for the next free token
+                    self.release(token, rate_limited=True)
+                    continue
+                self.release(token)
+                if error_code == 17:  # none of the screen names in this chunk exist
+                    return []
+                raise
+            self.release(token)
+            return [user.AsDict() for user in users]
+
+    # wait for a token that isn't in use and has budget left (or whose window has reset)
+    def acquire(self):
+        with self.condition:
+            while True:
+                now = time.time()
+                waits = []
+                for token in self.tokens:
+                    if token['busy']:
+                        continue
+                    if token['remaining'] > 0 or token['reset'] <= now:
+                        token['busy'] = True
+                        return token
+                    waits.append(token['reset'] - now)
+                # wakes up early if another token is released
+                waited_from = time.time()
+                self.condition.wait(min(waits) + 1 if waits else None)
+                self.wait_seconds += time.time() - waited_from
+
+    def release(self, token, rate_limited=False):
+        limit = token['api'].rate_limit.get_limit(self.url)
+        with self.condition:
+            self.calls += 1
+            self.rate_limited += rate_limited
+            token['remaining'] = int(limit.remaining)
+            token['reset'] = float(limit.reset)
+            if rate_limited:
+                token['remaining'] = 0
+                if not token['reset']:  # no rate limit headers; windows are 15 minutes
+                    token['reset'] = time.time() + 15 * 60
+            token['busy'] = False
+            self.condition.notify_all()
+
+def getTwitterErrorCode(e):
+    try:
+        return e.message[0]['code']
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+# load saved Twitter API results, reading only the given columns if any
+def loadTwitter(columns=None):
+    return applySchema(loadFrame('Twitter_API_Results', columns=columns), TWITTER_DTYPES)
@@ -0,0 +1,63 @@
+import re
+
+import pandas as pd
+
+''' USERNAMES AND PROFILE URLS '''
+
+# regex per service_key for pulling the username (group 1) out of a service_url
+USERNAME_PATTERNS = {
+    'twitter': r"(?:https?:\/\/)?(?:www\.)?twitter\.com\/(?:#!\/)?@?([^\/\?\s]*)",
+    # thanks to @marcgg and @nkanaev on GitHub thread: https://gist.github.com/marcgg/733592
+    'facebook': r"(?:https?:\/\/)?(?:www\.)?facebook\.com\/(?:.+\/)*([\w\.\-]+)",
+    'youtube': r"youtube\.com\/(?:user\/|channel\/|c\/)?([\w\.\-]+)",
+    'instagram': r"instagram\.com\/([\w\.]+)",
+    'flickr': r"flickr\.com\/(?:photos\/|people\/)?([\w@\.\-]+)",
+    'github': r"github\.com\/([\w\-]+)",
+    'pinterest': r"pinterest\.com\/([\w\-]+)",
+    'linkedin': r"linkedin\.com\/(?:company\/|showcase\/|groups\/|in\/)([\w\-]+)",
+    'google_plus': r"plus\.google\.com\/(?:b\/\d+\/)?\+?([\w\-]+)",
+    'medium': r"medium\.com\/@?([\w\.\-]+)",
+    'storify': r"storify\.com\/([\w\-]+)",
+    'tumblr': r"([\w\-]+)\.tumblr\.com",
+}
+
+COMPILED_PATTERNS = {key: re.compile(pattern, re.IGNORECASE) for key, pattern in USERNAME_PATTERNS.items()}
+
+# profile URL to rebuild from a username, per service_key (not YouTube, where the username may be a user, channel or
+# custom name and each has a different URL)
+PROFILE_URLS = {
+    'twitter': 'https://www.twitter.com/',
+    'facebook': 'https://www.facebook.com/',
+    'instagram': 'https://www.instagram.com/',
+    'flickr': 'https://www.flickr.com/photos/',
+    'github': 'https://github.com/',
+    'pinterest': 'https://www.pinterest.com/',
+    'medium': 'https://medium.com/@',
+    'storify': 'https://storify.com/',
+}
+
+# Whole-column version of get_username: each platform's rows are run through that platform's compiled pattern in one
+# str.extract call, instead of testing and searching URL by URL. Usernames are lower case; no match gives None.
+def get_usernames(service_key, service_url):
+    usernames = pd.Series(None, index=service_url.index, dtype=object)
+
+    for key, pattern in COMPILED_PATTERNS.items():
+        rows = (service_key == key).values
+        if rows.any():
+            usernames[rows] = service_url[rows].str.extract(pattern, expand=False).str.lower()
+
+    # an empty match (e.g. a bare twitter.com URL) isn't a username
+    usernames[usernames == ''] = None
+
+    return usernames.where(usernames.notnull(), None)
+
+# Whole-column version of generate_url: profile URL for every row whose platform and username we know
+def generate_urls(service_key, username):
+    urls = pd.Series(None, index=username.index, dtype=object)
+
+    for key, prefix in PROFILE_URLS.items():
+        rows = ((service_key == key) & username.notnull()).values
+        if rows.any():
+            urls[rows] = prefix + username[rows]
+
+    return urls
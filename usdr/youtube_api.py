@@ -0,0 +1,179 @@
+import re
+
+import pandas as pd
+
+from usdr.fetchers import PlatformFetcher
+from usdr.helpers import make_session
+from usdr.storage import saveFrame, loadFrame
+from usdr.schema import applySchema, YOUTUBE_DTYPES
+
+''' YOUTUBE API '''
+
+YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/'
+
+# /channel/<ID> URLs name the channel, /user/<name> URLs a legacy username and /@<name> URLs a handle. /c/<name> and
+# bare youtube.com/<name> URLs are custom URLs, which the API can't look up as such; most became the channel's handle
+# when handles were introduced, and bare ones can also be legacy usernames.
+YOUTUBE_URL_PATTERN = re.compile(r"youtube\.com\/(?:(channel|user|c)\/|(@))?([\w\.\-]+)", re.IGNORECASE)
+
+# paths of videos, playlists and other pages that don't name a channel
+YOUTUBE_PAGE_PATHS = ['watch', 'playlist', 'embed', 'v', 'results', 'feed', 'shorts', 'live', 'redirect', 'attribution_link']
+
+# channels.list filters to try, in order, for each kind of URL that names the channel rather than giving its ID
+YOUTUBE_LOOKUPS = {
+    'user': ['forUsername'],
+    'handle': ['forHandle'],
+    'custom': ['forHandle', 'forUsername'],
+}
+
+# Looks up the channel behind each YouTube URL in the registry, with its statistics and most recent upload.
+# Results are keyed by the USDR service_url, since channel IDs are case-sensitive and usernames aren't.
+def fetchYouTube(url_list, cache=None, executor=None):
+    results, fetched_at, errors = YouTubeFetcher().fetch(url_list, cache=cache, executor=executor)
+
+    print('\rFound information for ' + str(len(results)) + ' YouTube URLs.')
+    if errors:
+        print(str(len(errors)) + ' custom YouTube URLs match no handle or username:')
+        print(list(errors))
+
+    df = pd.DataFrame([youtubeRecord(url, channel) for url, channel in results.items()],
+                      columns=['url', 'id', 'title', 'custom_url', 'created_at', 'view_count', 'subscriber_count',
+                               'video_count', 'latest_upload'])
+
+    # UTC, like the timestamps the API returns
+    df['last_api_call'] = pd.to_datetime([fetched_at[url] for url in results], unit='s')
+
+    # save results for later reference
+    saveFrame(df, 'YouTube_API_Results')
+
+    return applySchema(df, YOUTUBE_DTYPES)
+
+# the columns we keep from a channel resource
+def youtubeRecord(url, channel):
+    snippet = channel.get('snippet', {})
+    statistics = channel.get('statistics', {})
+    return {
+        'url': url,
+        'id': channel['id'],
+        'title': snippet.get('title'),
+        'custom_url': snippet.get('customUrl'),
+        'created_at': snippet.get('publishedAt'),
+        'view_count': statistics.get('viewCount'),
+        'subscriber_count': statistics.get('subscriberCount'),
+        'video_count': statistics.get('videoCount'),
+        'latest_upload': channel.get('latest_upload'),
+    }
+
+class YouTubeFetcher(PlatformFetcher):
+    '''
+    YouTube Data API channels.list: channel URLs are looked up 50 IDs per
+    request, user, handle and custom URLs one request per lookup (forUsername
+    and forHandle take a single name), plus one playlistItems.list request per
+    channel for its latest upload.
+    '''
+
+    name = 'youtube'
+    stage_name = 'fetchYouTube'
+    title = 'YouTube API'
+    noun = 'URLs'
+    batch_size = 50
+    max_workers = 4
+    # the default quota is 10,000 units a day, and every request we make costs 1
+    rate_limit = (10000, 24 * 60 * 60)
+    fields = 'snippet,statistics,contentDetails'
+
+    def connect(self):
+        return YouTubeClient(getYouTubeKey())
+
+    def fetchBatch(self, client, batch):
+        found = {url: None for url in batch}
+        errors = {}
+        channel_urls = {}
+        named_urls = {}
+        for url in batch:
+            kind, name = parseYouTubeURL(url)
+            if kind == 'channel':
+                channel_urls.setdefault(name, []).append(url)
+            elif name:
+                named_urls.setdefault((kind, name), []).append(url)
+
+        channels = {}
+        requests_made = 0
+        if channel_urls:
+            self.throttle()
+            requests_made += 1
+            for channel in client.get('channels', part=self.fields, id=','.join(channel_urls), maxResults=50):
+                for url in channel_urls.get(channel['id'], []):
+                    found[url] = channel
+                channels[channel['id']] = channel
+        for (kind, name), urls in named_urls.items():
+            channel = None
+            for lookup in YOUTUBE_LOOKUPS[kind]:
+                self.throttle()
+                requests_made += 1
+                items = client.get('channels', part=self.fields, **{lookup: name})
+                if items:
+                    channel = items[0]
+                    break
+            for url in urls:
+                found[url] = channel
+                if channel is None and kind == 'custom':
+                    errors[url] = 'custom URL matches no handle or username'
+            if channel is not None:
+                channels[channel['id']] = channel
+
+        # a channel's uploads are a playlist, newest first
+        for channel in channels.values():
+            uploads = channel.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
+            if uploads:
+                self.throttle()
+                requests_made += 1
+                items = client.get('playlistItems', part='snippet', playlistId=uploads, maxResults=1)
+                channel['latest_upload'] = items[0]['snippet'] if items else None
+
+        return found, errors, requests_made
+
+class YouTubeClient(object):
+    '''
+    Minimal YouTube Data API v3 client over a retrying requests session.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+        self.session = make_session(pool_size=YouTubeFetcher.max_workers)
+
+    # the items of one page of a list request; a playlist that doesn't exist (a channel with no uploads) has none
+    def get(self, resource, **params):
+        resp = self.session.get(YOUTUBE_API_URL + resource, params=dict(params, key=self.key), timeout=30)
+        if resp.status_code == 404:
+            return []
+        resp.raise_for_status()
+        return resp.json().get('items', [])
+
+# ('channel', channel ID), ('user', username), ('handle', handle) or ('custom', custom name) for a YouTube URL, (None,
+# None) if it doesn't look like one or is a video, playlist or other page
+def parseYouTubeURL(url):
+    match = YOUTUBE_URL_PATTERN.search(url)
+    if not match:
+        return None, None
+    if match.group(2):
+        return 'handle', match.group(3)
+    if not match.group(1) and match.group(3).lower() in YOUTUBE_PAGE_PATHS:
+        return None, None
+    return {'channel': 'channel', 'user': 'user'}.get((match.group(1) or '').lower(), 'custom'), match.group(3)
+
+# settings is only needed once we actually call the API, so importing usdr works without API keys
+def getYouTubeKey():
+    import settings  # Be sure to add your platform API consumer keys/secrets to settings.py or this won't work
+    return settings.youtube_api_key
+
+# whether settings.py has a YouTube API key, so the pipeline can skip YouTube when it doesn't
+def youtubeConfigured():
+    try:
+        return bool(getYouTubeKey())
+    except (ImportError, AttributeError):
+        return False
+
+# load saved YouTube API results, reading only the given columns if any
+def loadYouTube(columns=None):
+    return applySchema(loadFrame('YouTube_API_Results', columns=columns), YOUTUBE_DTYPES)